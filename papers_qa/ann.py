@@ -0,0 +1,312 @@
+import math
+import os
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+
+import faiss
+import numpy as np
+
+from .config import (
+    EF_SEARCH, HNSW_M, INDEX_TYPE, INDEX_TYPES, IVF_NLIST, NPROBE, PQ_M, RERANK_DEPTH, TRAIN_SAMPLE,
+)
+from .vector_file import VectorWriter, open_vectors
+
+ADD_BATCH = 65536
+
+
+@dataclass(slots=True)
+class IndexSpec:
+    """How to build a FAISS index.
+
+    `flat` is the legacy exact L2 index on raw vectors. Every other kind
+    L2-normalises vectors and searches by inner product (cosine).
+    """
+    kind: str = INDEX_TYPE
+    nlist: int = IVF_NLIST  # 0 picks ~4*sqrt(n) from the training sample
+    pq_m: int = PQ_M
+    hnsw_m: int = HNSW_M
+    train_size: int = TRAIN_SAMPLE
+
+    def __post_init__(self) -> None:
+        if self.kind not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type '{self.kind}'. Choose one of: {', '.join(INDEX_TYPES)}")
+
+    @property
+    def normalize(self) -> bool:
+        return self.kind != "flat"
+
+    @property
+    def needs_training(self) -> bool:
+        return self.kind in ("ivf-flat", "ivf-pq", "sq8")
+
+    def factory_string(self, dim: int, n_train: int = 0) -> str:
+        if self.kind in ("flat", "flat-ip"):
+            return "Flat"
+        if self.kind == "hnsw":
+            return f"HNSW{self.hnsw_m},Flat"
+        # Scalar quantisers: 1 byte (int8, per-dimension ranges learned in training) or 2 bytes per dimension
+        if self.kind == "sq8":
+            return "SQ8"
+        if self.kind == "fp16":
+            return "SQfp16"
+        # Keep ~39 training points per centroid, as faiss k-means expects
+        nlist = self.nlist or int(4 * math.sqrt(max(n_train, 1)))
+        nlist = max(1, min(nlist, n_train // 39))
+        if self.kind == "ivf-flat":
+            return f"IVF{nlist},Flat"
+        m = max(d for d in range(1, min(self.pq_m, dim) + 1) if dim % d == 0)
+        nbits = max(1, min(8, int(math.log2(max(n_train // 39, 2)))))
+        return f"IVF{nlist},PQ{m}x{nbits}"
+
+    def create(self, dim: int, n_train: int = 0) -> faiss.Index:
+        metric = faiss.METRIC_INNER_PRODUCT if self.normalize else faiss.METRIC_L2
+        return faiss.index_factory(dim, self.factory_string(dim, n_train), metric)
+
+
+def uses_inner_product(index: faiss.Index) -> bool:
+    return index.metric_type == faiss.METRIC_INNER_PRODUCT
+
+
+def index_kind(index: faiss.Index) -> str:
+    """The `IndexSpec.kind` an index was built as, e.g. `flat-ip` when there were too few vectors to train."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return "ivf-pq" if isinstance(faiss.downcast_index(ivf), faiss.IndexIVFPQ) else "ivf-flat"
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return "fp16" if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "sq8"
+    return "flat-ip" if uses_inner_product(index) else "flat"
+
+
+def normalized(vecs: np.ndarray) -> np.ndarray:
+    out = np.array(vecs, dtype="float32", copy=True, order="C")
+    faiss.normalize_L2(out)
+    return out
+
+
+def configure_search(index: faiss.Index, nprobe: int = NPROBE, ef_search: int = EF_SEARCH) -> None:
+    """Apply search-time knobs (IVF `nprobe`, HNSW `efSearch`) where they apply."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+    hnsw = faiss.downcast_index(index)
+    if isinstance(hnsw, faiss.IndexHNSW):
+        hnsw.hnsw.efSearch = ef_search
+
+
+def search_parameters(index: faiss.Index, selector: faiss.IDSelector) -> faiss.SearchParameters:
+    """Search parameters restricting `index` to `selector`, keeping its current `nprobe`/`efSearch`."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+    hnsw = faiss.downcast_index(index)
+    if isinstance(hnsw, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=hnsw.hnsw.efSearch)
+    return faiss.SearchParameters(sel=selector)
+
+
+def enable_reconstruct(index: faiss.Index) -> None:
+    """Give IVF indexes a direct ID map so stored vectors can be looked up for rescoring."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and ivf.direct_map.type == faiss.DirectMap.NoMap:
+        ivf.make_direct_map()
+
+
+@dataclass(slots=True)
+class IndexBuilder:
+    """Add vectors to a new or existing index, training it first when needed.
+
+    Trainable kinds train on a uniform sample of `spec.train_size` vectors
+    drawn from the whole stream (reservoir sampling), so the sample isn't
+    skewed towards the first PDFs. Until `finish` trains the index, vectors
+    are held in memory and, past `spec.train_size`, spilled to a temporary
+    file; `index` stays None until then. `sink`, if set, gets every batch
+    as stored (normalised where the index uses cosine), in ID order, e.g.
+    to keep exact copies next to a quantised index.
+    """
+    spec: IndexSpec = field(default_factory=IndexSpec)
+    index: Optional[faiss.Index] = None
+    sink: Optional[Callable[[np.ndarray], None]] = None
+    seed: int = 0
+    _pending: List[np.ndarray] = field(default_factory=list, init=False)
+    _n_pending: int = field(default=0, init=False)
+    _sample: Optional[np.ndarray] = field(default=None, init=False)
+    _spill: Optional[VectorWriter] = field(default=None, init=False)
+    _rng: Optional[np.random.Generator] = field(default=None, init=False)
+
+    def add(self, vecs: np.ndarray) -> None:
+        if self.index is not None:
+            if uses_inner_product(self.index):
+                vecs = normalized(vecs)
+            vecs = np.ascontiguousarray(vecs, dtype="float32")
+            if self.sink is not None:
+                self.sink(vecs)
+            self.index.add(vecs)
+            return
+        if self.spec.normalize:
+            vecs = normalized(vecs)
+        vecs = np.ascontiguousarray(vecs, dtype="float32")
+        if self.sink is not None:
+            self.sink(vecs)
+        if not self.spec.needs_training:
+            self.index = self.spec.create(vecs.shape[1])
+            self.index.add(vecs)
+            return
+        self._reservoir(vecs)
+        if self._spill is not None:
+            self._spill.append(vecs)
+            return
+        self._pending.append(vecs)
+        if self._n_pending > self.spec.train_size:
+            # Too many to keep in memory until training; the rest goes to disk
+            fd, path = tempfile.mkstemp(suffix=".f32")
+            os.close(fd)
+            self._spill = VectorWriter(path)
+            for v in self._pending:
+                self._spill.append(v)
+            self._pending.clear()
+
+    def finish(self) -> Optional[faiss.Index]:
+        if self._n_pending:
+            self._train_pending()
+        return self.index
+
+    def _reservoir(self, vecs: np.ndarray) -> None:
+        size = self.spec.train_size
+        if self._sample is None:
+            self._sample = np.empty((size, vecs.shape[1]), dtype="float32")
+            self._rng = np.random.default_rng(self.seed)
+        seen = self._n_pending + np.arange(vecs.shape[0])
+        fill = seen < size
+        self._sample[seen[fill]] = vecs[fill]
+        # Algorithm R: vector t replaces a random slot with probability size / (t + 1)
+        slots = self._rng.integers(0, seen[~fill] + 1) if not fill.all() else seen[:0]
+        keep = slots < size
+        self._sample[slots[keep]] = vecs[~fill][keep]
+        self._n_pending += vecs.shape[0]
+
+    def _train_pending(self) -> None:
+        n, sample = self._n_pending, self._sample
+        dim = sample.shape[1]
+        sample = sample[: min(n, self.spec.train_size)]
+        if n < 39:
+            print(f"Only {n} vectors; too few to train '{self.spec.kind}', using flat-ip instead.")
+            index = IndexSpec(kind="flat-ip").create(dim)
+        else:
+            index = self.spec.create(dim, sample.shape[0])
+            index.train(sample)
+        if self._spill is None:
+            for v in self._pending:
+                index.add(v)
+        else:
+            self._spill.close()
+            try:
+                stored = open_vectors(self._spill.path, dim, n)
+                for i in range(0, n, ADD_BATCH):
+                    index.add(np.ascontiguousarray(stored[i:i + ADD_BATCH]))
+                del stored
+            finally:
+                os.remove(self._spill.path)
+        self._pending.clear()
+        self._n_pending = 0
+        self._sample = self._spill = None
+        configure_search(index)
+        self.index = index
+
+
+def _percentile_ms(samples: Sequence[float], q: float) -> float:
+    return float(np.percentile(np.asarray(samples) * 1000.0, q))
+
+
+def evaluate_index_types(
+    vectors: np.ndarray,
+    kinds: Sequence[str] = INDEX_TYPES[1:],
+    k: int = 10,
+    n_queries: int = 200,
+    nprobes: Sequence[int] = (1, 4, 16, 64),
+    ef_searches: Sequence[int] = (16, 64, 256),
+    seed: int = 0,
+    rescore_depth: int = RERANK_DEPTH,
+) -> List[Dict[str, object]]:
+    """Recall@k and per-query latency of each index setting against exact cosine search.
+
+    A random sample of `n_queries` vectors is held out as queries; the
+    remaining vectors form the database. `rescored` is the recall after
+    fetching `k * rescore_depth` candidates and re-ranking them by exact
+    float32 cosine, as search does when exact vectors are kept.
+    """
+    rng = np.random.default_rng(seed)
+    vectors = normalized(vectors)
+    n_queries = min(n_queries, max(vectors.shape[0] // 10, 1))
+    perm = rng.permutation(vectors.shape[0])
+    queries, base = vectors[perm[:n_queries]], vectors[perm[n_queries:]]
+    k = min(k, base.shape[0])
+    dim = base.shape[1]
+
+    exact = faiss.IndexFlatIP(dim)
+    exact.add(base)
+    _, truth = exact.search(queries, k)
+
+    def recall(found: np.ndarray) -> float:
+        return sum(len(set(found[i]) & set(truth[i])) for i in range(n_queries)) / float(n_queries * k)
+
+    def measure(index: faiss.Index) -> Dict[str, float]:
+        found = np.empty_like(truth)
+        lat: List[float] = []
+        for i in range(n_queries):
+            t0 = time.perf_counter()
+            _, ids = index.search(queries[i:i + 1], k)
+            lat.append(time.perf_counter() - t0)
+            found[i] = ids[0]
+        depth = min(k * max(rescore_depth, 1), base.shape[0])
+        _, cands = index.search(queries, depth)
+        rescored = np.empty_like(truth)
+        for i in range(n_queries):
+            ids = cands[i][cands[i] >= 0]
+            scores = base[ids] @ queries[i]
+            top = ids[np.argsort(-scores, kind="stable")[:k]]
+            rescored[i] = np.pad(top, (0, k - top.shape[0]), constant_values=-1)
+        return {
+            "recall": recall(found),
+            "rescored": recall(rescored),
+            "mean_ms": float(np.mean(lat) * 1000.0),
+            "p95_ms": _percentile_ms(lat, 95),
+        }
+
+    rows: List[Dict[str, object]] = []
+    for kind in kinds:
+        spec = IndexSpec(kind=kind)
+        builder = IndexBuilder(spec)
+        t0 = time.perf_counter()
+        builder.add(base)
+        index = builder.finish()
+        build_s = time.perf_counter() - t0
+        size_mb = faiss.serialize_index(index).nbytes / 1e6
+        label = spec.factory_string(dim, min(base.shape[0], spec.train_size))
+
+        if faiss.try_extract_index_ivf(index) is not None:
+            settings = [("nprobe", p) for p in nprobes]
+        elif isinstance(faiss.downcast_index(index), faiss.IndexHNSW):
+            settings = [("efSearch", e) for e in ef_searches]
+        else:
+            settings = [("", 0)]
+        for knob, value in settings:
+            if knob == "nprobe":
+                configure_search(index, nprobe=value)
+            elif knob == "efSearch":
+                configure_search(index, ef_search=value)
+            row: Dict[str, object] = {
+                "kind": kind,
+                "factory": label,
+                "param": f"{knob}={value}" if knob else "-",
+                "build_s": build_s,
+                "size_mb": size_mb,
+                "f32_mb": base.nbytes / 1e6,
+            }
+            row.update(measure(index))
+            rows.append(row)
+    return rows
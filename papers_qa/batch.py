@@ -0,0 +1,140 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from .config import BATCH_CONCURRENCY
+from .faiss_store import MetadataFilter
+from .rag import Context, RagPipeline
+
+Question = Tuple[object, str]
+
+
+@dataclass(slots=True)
+class BatchSummary:
+    total: int
+    skipped: int
+    answered: int
+    failed: int
+    retrieval_ms: float
+    elapsed_s: float
+
+
+def read_questions(path: str) -> List[Question]:
+    """`(id, question)` pairs from JSONL.
+
+    Each line is `{"id": ..., "question": ...}` or a bare JSON string; the
+    id defaults to the 1-based line number.
+    """
+    out: List[Question] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            obj = json.loads(line)
+            if isinstance(obj, str):
+                obj = {"question": obj}
+            question = str(obj.get("question", "")).strip()
+            if not question:
+                raise ValueError(f"{path}:{lineno}: missing 'question'")
+            out.append((obj.get("id", lineno), question))
+    return out
+
+
+def completed_ids(path: str) -> Set[str]:
+    """IDs already answered in an output file from an earlier run.
+
+    A line cut short by an interrupted run is truncated away so appends
+    start on a clean line. Failed questions are not counted, so they are
+    retried; their old error lines stay, and the last line per id wins.
+    """
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end != len(data):
+            f.truncate(end)
+    for line in data[:end].splitlines():
+        try:
+            obj = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(obj, dict) and obj.get("answer") is not None:
+            done.add(str(obj.get("id")))
+    return done
+
+
+def _answer(pipeline: RagPipeline, qid: object, question: str, ids: List[int], contexts: List[Context]) -> Dict[str, object]:
+    timings: Dict[str, float] = {}
+    packed = pipeline.pack(contexts, ids, timings) if contexts else []
+    record: Dict[str, object] = {
+        "id": qid,
+        "question": question,
+        "sources": pipeline.sources(packed),
+        "chunk_ids": ids,
+    }
+    if not contexts:
+        record["answer"] = ""
+        return record
+    try:
+        record["answer"] = "".join(pipeline.generate(question, contexts, timings, ids=ids, packed=packed))
+    except RuntimeError as e:
+        record["error"] = str(e)
+    record["timings"] = timings
+    return record
+
+
+def run_batch(
+    pipeline: RagPipeline,
+    questions_path: str,
+    out_path: str,
+    concurrency: int = BATCH_CONCURRENCY,
+    mode: Optional[str] = None,
+    where: Optional[MetadataFilter] = None,
+) -> BatchSummary:
+    """Answer every question in `questions_path`, appending JSONL records to `out_path`.
+
+    Questions already answered in `out_path` are skipped, so an interrupted
+    run picks up where it stopped. Pending questions are retrieved together
+    (one embedding pass, one stacked FAISS search); generations then run
+    `concurrency` at a time and each record is flushed as it completes.
+    """
+    t_start = time.perf_counter()
+    questions = read_questions(questions_path)
+    done = completed_ids(out_path)
+    pending = [(qid, q) for qid, q in questions if str(qid) not in done]
+    summary = BatchSummary(len(questions), len(questions) - len(pending), 0, 0, 0.0, 0.0)
+    if not pending:
+        summary.elapsed_s = time.perf_counter() - t_start
+        return summary
+
+    timings: Dict[str, float] = {}
+    t0 = time.perf_counter()
+    all_ids = pipeline.search_many([q for _, q in pending], timings, mode, where)
+    summary.retrieval_ms = (time.perf_counter() - t0) * 1000.0
+    print(f"retrieved {len(pending)} questions in {summary.retrieval_ms:.0f} ms", flush=True)
+
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)) or ".", exist_ok=True)
+    with open(out_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+        futures = [
+            pool.submit(_answer, pipeline, qid, q, ids, pipeline.contexts(ids))
+            for (qid, q), ids in zip(pending, all_ids)
+        ]
+        for n, fut in enumerate(as_completed(futures), 1):
+            record = fut.result()
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            if "error" in record:
+                summary.failed += 1
+                status = f"error: {record['error']}"
+            else:
+                summary.answered += 1
+                status = f"{record.get('timings', {}).get('generate_ms', 0.0):.0f} ms"
+            print(f"[{summary.skipped + n}/{summary.total}] {record['id']}: {status}", flush=True)
+
+    summary.elapsed_s = time.perf_counter() - t_start
+    return summary
@@ -0,0 +1,264 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+
+from .config import CHUNK_OVERLAP, CHUNK_SIZE, INDEX_TYPE, INDEX_WORKERS, TOP_K
+from .chunking import iter_pdf_chunks, list_pdfs
+from .embeddings import EmbeddingClient
+from .fake_ollama import FakeOllama, hash_vector
+from .faiss_store import FaissStore
+from .ollama_client import OllamaClient
+from .rag import RagPipeline
+
+RESULTS_VERSION = 1
+
+
+@dataclass(slots=True)
+class Metric:
+    value: float
+    unit: str
+    higher_is_better: bool = False
+
+
+Metrics = Dict[str, Metric]
+
+
+def _percentiles(name: str, samples_ms: Sequence[float], metrics: Metrics) -> None:
+    arr = np.asarray(samples_ms, dtype="float64")
+    for p in (50, 95, 99):
+        metrics[f"{name}_p{p}_ms"] = Metric(float(np.percentile(arr, p)), "ms")
+
+
+def _sample_queries(texts: Sequence[str], n: int, words: int = 12) -> List[str]:
+    # Evenly spaced chunk openings: deterministic and spread over the corpus
+    if not texts:
+        return []
+    picks = np.linspace(0, len(texts) - 1, num=min(n, len(texts))).astype(int)
+    return [" ".join(texts[i].split()[:words]) or texts[i][:80] for i in picks]
+
+
+_IMPORT_PROBE = "import time; t = time.perf_counter(); import papers_qa.cli; print((time.perf_counter() - t) * 1000)"
+
+
+def bench_startup(metrics: Metrics, runs: int = 5) -> None:
+    """CLI cold-start cost in fresh interpreters; the best of `runs` filters out scheduler noise."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")])))
+    imports: List[float] = []
+    helps: List[float] = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", _IMPORT_PROBE], env=env, capture_output=True, text=True)
+        if out.returncode != 0:
+            raise RuntimeError(f"importing papers_qa.cli failed: {out.stderr.strip()}")
+        imports.append(float(out.stdout.strip().splitlines()[-1]))
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "papers_qa.cli", "--help"], env=env, capture_output=True)
+        helps.append((time.perf_counter() - t0) * 1000.0)
+    metrics["cli_import_ms"] = Metric(min(imports), "ms")
+    metrics["cli_help_ms"] = Metric(min(helps), "ms")
+
+
+def bench_chunking(folder: str, workers: int, metrics: Metrics) -> List[str]:
+    pdf_bytes = sum(os.path.getsize(p) for p in list_pdfs(folder))
+    t0 = time.perf_counter()
+    texts = [c.text for c in iter_pdf_chunks(folder, CHUNK_SIZE, CHUNK_OVERLAP, workers=workers)]
+    elapsed = time.perf_counter() - t0
+    metrics["chunking_s"] = Metric(elapsed, "s")
+    metrics["chunking_chunks_per_s"] = Metric(len(texts) / elapsed, "chunks/s", True)
+    metrics["chunking_mb_per_s"] = Metric(pdf_bytes / 1e6 / elapsed, "MB/s", True)
+    return texts
+
+
+def bench_embedding(texts: Sequence[str], client: EmbeddingClient, metrics: Metrics) -> None:
+    t0 = time.perf_counter()
+    n = sum(len(batch) for batch, _ in client.embed_stream(texts))
+    elapsed = time.perf_counter() - t0
+    metrics["embed_texts_per_s"] = Metric(n / elapsed, "texts/s", True)
+
+
+def bench_build(store: FaissStore, folder: str, workers: int, index_type: str, metrics: Metrics) -> None:
+    t0 = time.perf_counter()
+    store.build(rebuild=True, folder_path=folder, workers=workers, index_type=index_type)
+    metrics["index_build_s"] = Metric(time.perf_counter() - t0, "s")
+    metrics["index_size_mb"] = Metric(os.path.getsize(store.index_path) / 1e6, "MB")
+
+
+def bench_load(index_path: str, metadata_path: str, metrics: Metrics, lookups: int = 1000) -> FaissStore:
+    store = FaissStore(index_path=index_path, metadata_path=metadata_path)
+    t0 = time.perf_counter()
+    store.load_index()
+    t1 = time.perf_counter()
+    metadata = store.load_metadata()
+    t2 = time.perf_counter()
+    store.load_bm25()
+    t3 = time.perf_counter()
+    rows = np.random.default_rng(0).integers(0, len(metadata), size=lookups)
+    t4 = time.perf_counter()
+    for i in rows:
+        metadata[int(i)]
+    t5 = time.perf_counter()
+    metrics["index_load_ms"] = Metric((t1 - t0) * 1000.0, "ms")
+    metrics["metadata_load_ms"] = Metric((t2 - t1) * 1000.0, "ms")
+    metrics["bm25_load_ms"] = Metric((t3 - t2) * 1000.0, "ms")
+    metrics["metadata_lookup_us"] = Metric((t5 - t4) * 1e6 / lookups, "us")
+    return store
+
+
+def bench_search(pipeline: RagPipeline, queries: Sequence[str], dim: int, metrics: Metrics) -> None:
+    store = pipeline.store
+    qvecs = np.vstack([hash_vector(pipeline.query_cache.key(q), dim) for q in queries])
+    # Seeding the query LRU keeps embedding out of pipeline-level timings
+    for q, row in zip(queries, qvecs):
+        pipeline.query_cache.put(q, row[None, :])
+    dense: List[float] = []
+    for row in qvecs:
+        t0 = time.perf_counter()
+        store.retrieve(row[None, :], TOP_K)
+        dense.append((time.perf_counter() - t0) * 1000.0)
+    _percentiles("search_dense", dense, metrics)
+
+    t0 = time.perf_counter()
+    store.retrieve_many(qvecs, TOP_K)
+    metrics["search_batch_us_per_query"] = Metric((time.perf_counter() - t0) * 1e6 / len(queries), "us")
+
+    bm25 = store.load_bm25()
+    if bm25 is None:
+        return
+    lexical: List[float] = []
+    for q in queries:
+        t0 = time.perf_counter()
+        bm25.search(q, TOP_K)
+        lexical.append((time.perf_counter() - t0) * 1000.0)
+    _percentiles("search_lexical", lexical, metrics)
+
+    hybrid: List[float] = []
+    for q in queries:
+        t0 = time.perf_counter()
+        pipeline.search(q, mode="hybrid")
+        hybrid.append((time.perf_counter() - t0) * 1000.0)
+    _percentiles("search_hybrid", hybrid, metrics)
+
+
+def bench_generate(pipeline: RagPipeline, queries: Sequence[str], metrics: Metrics) -> None:
+    first_token: List[float] = []
+    tokens: List[float] = []
+    for q in queries:
+        ids = pipeline.search(q)
+        timings: Dict[str, float] = {}
+        for _ in pipeline.generate(q, pipeline.contexts(ids), timings, ids=ids):
+            pass
+        first_token.append(timings.get("first_token_ms", 0.0))
+        tokens.append(timings.get("context_tokens", 0.0))
+    _percentiles("generate_first_token", first_token, metrics)
+    metrics["context_tokens_mean"] = Metric(float(np.mean(tokens)), "tokens")
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def run_benchmarks(
+    folder: str,
+    n_queries: int = 200,
+    workers: Optional[int] = None,
+    index_type: Optional[str] = None,
+    dim: int = 768,
+    work_dir: Optional[str] = None,
+    startup_only: bool = False,
+) -> Dict[str, object]:
+    """Run every stage against a local `FakeOllama` and return JSON-ready results.
+
+    Stages: CLI startup (import and `--help` wall time), PDF chunking, embedding client throughput, full index build,
+    index/metadata/BM25 load, dense/lexical/hybrid search latency and
+    generation time-to-first-token. The fake server answers instantly, so
+    the numbers measure this package rather than the models.
+    """
+    workers = workers or INDEX_WORKERS
+    index_type = index_type or INDEX_TYPE
+    metrics: Metrics = {}
+    meta: Dict[str, object] = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "faiss": faiss.__version__,
+        "cpus": os.cpu_count(),
+    }
+    bench_startup(metrics)
+    if startup_only:
+        return {"version": RESULTS_VERSION, "meta": meta, "metrics": {name: asdict(m) for name, m in metrics.items()}}
+
+    with FakeOllama(dim=dim) as fake, tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+        texts = bench_chunking(folder, workers, metrics)
+        if not texts:
+            raise RuntimeError(f"No PDF chunks found in {folder}.")
+        bench_embedding(texts, EmbeddingClient(host=fake.url), metrics)
+
+        index_path = os.path.join(tmp, "bench.faiss")
+        metadata_path = os.path.join(tmp, "bench.bin")
+        bench_build(
+            FaissStore(index_path, metadata_path, embedder=EmbeddingClient(host=fake.url)),
+            folder, workers, index_type, metrics,
+        )
+        store = bench_load(index_path, metadata_path, metrics)
+        pipeline = RagPipeline(store, OllamaClient(host=fake.url), answers=None)
+        queries = _sample_queries(texts, n_queries)
+        bench_search(pipeline, queries, dim, metrics)
+        bench_generate(pipeline, queries[:50], metrics)
+
+    meta.update({
+        "corpus": os.path.abspath(folder),
+        "pdfs": len(list_pdfs(folder)),
+        "chunks": len(texts),
+        "queries": len(queries),
+        "index_type": index_type,
+        "workers": workers,
+        "dim": dim,
+    })
+    return {"version": RESULTS_VERSION, "meta": meta, "metrics": {name: asdict(m) for name, m in metrics.items()}}
+
+
+def save_results(results: Dict[str, object], path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+        f.write("\n")
+
+
+def load_results(path: str) -> Dict[str, object]:
+    with open(path, "r", encoding="utf-8") as f:
+        results = json.load(f)
+    if results.get("version") != RESULTS_VERSION:
+        raise ValueError(f"{path} is not a version {RESULTS_VERSION} benchmark result")
+    return results
+
+
+def compare(
+    current: Dict[str, object], baseline: Dict[str, object], threshold: float
+) -> List[Tuple[str, float, float, float, bool]]:
+    """`(metric, baseline, current, relative change, regressed)` for metrics present in both runs.
+
+    A metric regresses when it moves more than `threshold` (e.g. 0.2 = 20%)
+    in its bad direction.
+    """
+    rows: List[Tuple[str, float, float, float, bool]] = []
+    base_metrics: Dict[str, dict] = baseline["metrics"]  # type: ignore[assignment]
+    for name, cur in current["metrics"].items():  # type: ignore[union-attr]
+        base = base_metrics.get(name)
+        if base is None or not base["value"]:
+            continue
+        change = (cur["value"] - base["value"]) / abs(base["value"])
+        worse = -change if cur["higher_is_better"] else change
+        rows.append((name, base["value"], cur["value"], change, worse > threshold))
+    return rows
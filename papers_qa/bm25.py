@@ -0,0 +1,152 @@
+import re
+from array import array
+from dataclasses import dataclass, field
+from typing import BinaryIO, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .config import BM25_B, BM25_K1, RRF_K
+
+# Keeps compound names like "agent+p", "gpt-4o" or "v1.5" together
+_TOKEN = re.compile(r"[a-z0-9]+(?:[+\-.][a-z0-9]+)*\+*")
+_PARTS = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms; compounds are emitted whole and as their alphanumeric parts."""
+    out: List[str] = []
+    for tok in _TOKEN.findall(text.lower()):
+        out.append(tok)
+        if not tok.isalnum():
+            out.extend(p for p in _PARTS.findall(tok) if p != tok)
+    return out
+
+
+class BM25Builder:
+    """Accumulates postings for documents added in vector-ID order."""
+
+    def __init__(self) -> None:
+        self._docs: Dict[str, array] = {}
+        self._tfs: Dict[str, array] = {}
+        self._lengths = array("I")
+
+    def add(self, text: str) -> None:
+        doc_id = len(self._lengths)
+        terms = tokenize(text)
+        self._lengths.append(len(terms))
+        counts: Dict[str, int] = {}
+        for t in terms:
+            counts[t] = counts.get(t, 0) + 1
+        for t, c in counts.items():
+            if t not in self._docs:
+                self._docs[t] = array("I")
+                self._tfs[t] = array("H")
+            self._docs[t].append(doc_id)
+            self._tfs[t].append(min(c, 0xFFFF))
+
+    def finish(self) -> "BM25Index":
+        vocab = sorted(self._docs)
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        for i, t in enumerate(vocab):
+            offsets[i + 1] = offsets[i] + len(self._docs[t])
+        doc_ids = np.empty(int(offsets[-1]), dtype=np.uint32)
+        tfs = np.empty(int(offsets[-1]), dtype=np.uint16)
+        for i, t in enumerate(vocab):
+            doc_ids[offsets[i]:offsets[i + 1]] = np.frombuffer(self._docs[t], dtype=np.uint32)
+            tfs[offsets[i]:offsets[i + 1]] = np.frombuffer(self._tfs[t], dtype=np.uint16)
+        return BM25Index(vocab, offsets, doc_ids, tfs, np.frombuffer(self._lengths, dtype=np.uint32).copy())
+
+
+@dataclass(slots=True)
+class BM25Index:
+    """BM25 over array-backed posting lists.
+
+    Postings of term i are `doc_ids[offsets[i]:offsets[i+1]]` with matching
+    term frequencies in `tfs`. Document IDs are FAISS vector IDs.
+    """
+    vocab: List[str]
+    offsets: np.ndarray
+    doc_ids: np.ndarray
+    tfs: np.ndarray
+    lengths: np.ndarray
+    _term_ids: Dict[str, int] = field(default_factory=dict, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._term_ids = {t: i for i, t in enumerate(self.vocab)}
+
+    @classmethod
+    def build(cls, texts: Iterable[str]) -> "BM25Index":
+        builder = BM25Builder()
+        for text in texts:
+            builder.add(text)
+        return builder.finish()
+
+    def __len__(self) -> int:
+        return int(self.lengths.shape[0])
+
+    def save(self, path: str) -> None:
+        vocab_blob = "\n".join(self.vocab).encode("utf-8")
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                vocab=np.frombuffer(vocab_blob, dtype=np.uint8),
+                offsets=self.offsets,
+                doc_ids=self.doc_ids,
+                tfs=self.tfs,
+                lengths=self.lengths,
+            )
+
+    @classmethod
+    def load(cls, source: Union[str, BinaryIO]) -> "BM25Index":
+        with np.load(source) as data:
+            blob = data["vocab"].tobytes().decode("utf-8")
+            vocab = blob.split("\n") if blob else []
+            return cls(vocab, data["offsets"], data["doc_ids"], data["tfs"], data["lengths"])
+
+    def search(
+        self, query: str, top_k: int, k1: float = BM25_K1, b: float = BM25_B, mask: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return `(scores, ids)` of the best `top_k` documents, best first.
+
+        With a boolean `mask` over document IDs, only documents where it is
+        True can be returned.
+        """
+        n = len(self)
+        term_ids = [self._term_ids[t] for t in dict.fromkeys(tokenize(query)) if t in self._term_ids]
+        if not n or not term_ids:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+        avgdl = float(self.lengths.mean()) or 1.0
+        scores = np.zeros(n, dtype=np.float32)
+        for tid in term_ids:
+            lo, hi = int(self.offsets[tid]), int(self.offsets[tid + 1])
+            docs = self.doc_ids[lo:hi]
+            tf = self.tfs[lo:hi].astype(np.float32)
+            df = hi - lo
+            idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5))
+            norm = k1 * (1.0 - b + b * self.lengths[docs] / avgdl)
+            # Each doc appears once per term's postings, so plain fancy-index add is safe
+            scores[docs] += idf * tf * (k1 + 1.0) / (tf + norm)
+        if mask is not None:
+            scores *= mask
+        hits = np.flatnonzero(scores)
+        if hits.size > top_k:
+            hits = hits[np.argpartition(-scores[hits], top_k - 1)[:top_k]]
+        order = hits[np.argsort(-scores[hits], kind="stable")]
+        return scores[order], order.astype(np.int64)
+
+
+def rrf_scores(rankings: Sequence[Sequence[int]], k: int = RRF_K) -> Dict[int, float]:
+    """Reciprocal-rank fusion scores: the sum of 1 / (k + rank) over the lists an ID appears in."""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            if doc < 0:
+                continue
+            fused[int(doc)] = fused.get(int(doc), 0.0) + 1.0 / (k + rank + 1)
+    return fused
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], top_k: int, k: int = RRF_K) -> List[int]:
+    """Fuse ranked ID lists by summing 1 / (k + rank)."""
+    fused = rrf_scores(rankings, k)
+    return [doc for doc, _ in sorted(fused.items(), key=lambda kv: -kv[1])[:top_k]]
@@ -0,0 +1,118 @@
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+import faiss
+import numpy as np
+
+from .manifest import Manifest
+from .metadata_store import WriterState
+from .vector_file import vectors_path_for
+
+CHECKPOINT_VERSION = 1
+
+
+@dataclass(slots=True)
+class BuildState:
+    """A resumable snapshot: the index so far, the PDFs it fully covers and the metadata writer's position.
+
+    With `exact_vectors`, the partial side file holds the first
+    `index.ntotal` float32 vectors.
+    """
+    kind: str
+    index: faiss.Index
+    manifest: Manifest
+    writer: WriterState
+    exact_vectors: bool = False
+
+
+@dataclass(slots=True)
+class BuildCheckpoint:
+    """Periodic snapshots of a full build in progress, kept next to its output paths.
+
+    Metadata (and exact vectors, if kept) are written to `.partial` files
+    beside their final paths as the build runs. Each
+    snapshot writes the index to a new numbered file, then atomically
+    replaces the state file naming it, so a crash at any point leaves the
+    previous snapshot intact.
+    """
+    index_path: str
+    metadata_path: str
+    _generation: int = field(default=0, init=False)
+
+    @property
+    def state_path(self) -> str:
+        return f"{self.index_path}.ckpt.npz"
+
+    @property
+    def partial_metadata_path(self) -> str:
+        return f"{self.metadata_path}.partial"
+
+    @property
+    def partial_vectors_path(self) -> str:
+        return f"{vectors_path_for(self.index_path)}.partial"
+
+    def _index_file(self, generation: int) -> str:
+        return f"{self.index_path}.ckpt-{generation}"
+
+    def exists(self) -> bool:
+        return os.path.exists(self.state_path)
+
+    def load(self) -> Optional[BuildState]:
+        if not self.exists():
+            return None
+        with np.load(self.state_path, allow_pickle=False) as data:
+            state = json.loads(str(data["state"]))
+            arrays = {name: data[name] for name in data.files if name != "state"}
+        if state.get("version") != CHECKPOINT_VERSION or not os.path.exists(self.partial_metadata_path):
+            return None
+        manifest = Manifest.from_dict(state["manifest"])
+        index_file = self._index_file(state["generation"])
+        exact_vectors = bool(state.get("exact_vectors", False))
+        if manifest is None or not os.path.exists(index_file):
+            return None
+        if exact_vectors and not os.path.exists(self.partial_vectors_path):
+            return None
+        self._generation = state["generation"]
+        writer: WriterState = dict(state["writer"])
+        writer.update(arrays)
+        return BuildState(state["kind"], faiss.read_index(index_file), manifest, writer, exact_vectors)
+
+    def save(
+        self, kind: str, index: faiss.Index, manifest: Manifest, writer: WriterState, exact_vectors: bool = False
+    ) -> None:
+        generation = self._generation + 1
+        faiss.write_index(index, self._index_file(generation))
+        arrays: Dict[str, np.ndarray] = {k: v for k, v in writer.items() if isinstance(v, np.ndarray)}
+        state = {
+            "version": CHECKPOINT_VERSION,
+            "kind": kind,
+            "generation": generation,
+            "ntotal": int(index.ntotal),
+            "exact_vectors": exact_vectors,
+            "manifest": manifest.to_dict(),
+            "writer": {k: v for k, v in writer.items() if k not in arrays},
+        }
+        tmp = f"{self.state_path}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, state=np.array(json.dumps(state)), **arrays)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.state_path)
+        previous = self._index_file(self._generation)
+        if os.path.exists(previous):
+            os.remove(previous)
+        self._generation = generation
+
+    def clear(self) -> None:
+        """Remove every snapshot file and the partial metadata and vectors."""
+        folder, prefix = os.path.split(os.path.abspath(f"{self.index_path}.ckpt"))
+        if os.path.isdir(folder):
+            for name in os.listdir(folder):
+                if name.startswith(prefix):
+                    os.remove(os.path.join(folder, name))
+        for path in (self.partial_metadata_path, self.partial_vectors_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self._generation = 0
@@ -1,60 +1,197 @@
 import os
 import re
-from typing import List, Tuple
-from PyPDF2 import PdfReader
-import tiktoken
+from bisect import bisect_right
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    # PyPDF2 and tiktoken are imported where used, keeping them off the CLI's startup path
+    import tiktoken
+    from PyPDF2 import PdfReader
 
 SECTION_PATTERN = re.compile(r"^\s*\d+(\.\d+)*\s+[A-Z][A-Za-z0-9 ,\-]+")
+DEFAULT_ENCODING = "cl100k_base"
 
 
-def pdf_to_token_chunks(
-    folder: str, chunk_size: int, overlap: int, model_encoding: str = "cl100k_base"
-) -> List[Tuple[str, str, str]]:
-    enc = tiktoken.get_encoding(model_encoding)
-    items: List[Tuple[str, str, str]] = []
+@dataclass(slots=True)
+class Chunk:
+    """A token window of a PDF with its location in the extracted text."""
+    file: str
+    section: str
+    text: str
+    page: int
+    start_char: int
+    end_char: int
+
+
+def _page_lines(reader: "PdfReader") -> Tuple[List[str], List[int]]:
+    """Return non-empty stripped lines and the index of the first line of each page."""
+    lines: List[str] = []
+    page_starts: List[int] = []
+    for page in reader.pages:
+        page_starts.append(len(lines))
+        text = page.extract_text() or ""
+        lines.extend(l.strip() for l in text.split("\n") if l.strip())
+    return lines, page_starts
+
+
+def text_to_token_chunks(
+    name: str,
+    lines: List[str],
+    page_starts: List[int],
+    enc: "tiktoken.Encoding",
+    chunk_size: int,
+    overlap: int,
+) -> List[Chunk]:
+    """Chunk one document in a single pass over its tokens.
+
+    Character offsets of every token are computed once; the line, section and
+    page of each chunk are then found by binary search.
+    """
+    text = "\n".join(lines)
+    tokens = enc.encode(text)
+    if not tokens:
+        return []
+    decoded, token_offsets = enc.decode_with_offsets(tokens)
+
+    line_starts: List[int] = []
+    pos = 0
+    for line in lines:
+        line_starts.append(pos)
+        pos += len(line) + 1
+
+    marker_lines: List[int] = []
+    marker_titles: List[str] = []
+    for i, line in enumerate(lines):
+        if SECTION_PATTERN.match(line):
+            marker_lines.append(i)
+            marker_titles.append(line)
+
+    step = max(chunk_size - overlap, 1)
+    chunks: List[Chunk] = []
+    for start in range(0, len(tokens), step):
+        end = min(start + chunk_size, len(tokens))
+        start_char = token_offsets[start]
+        end_char = token_offsets[end] if end < len(tokens) else len(decoded)
+        raw = decoded[start_char:end_char]
+        chunk_text = raw.strip()
+        if not chunk_text:
+            continue
+        start_char += len(raw) - len(raw.lstrip())
+        end_char = start_char + len(chunk_text)
+
+        line_idx = max(bisect_right(line_starts, start_char) - 1, 0)
+        m = bisect_right(marker_lines, line_idx)
+        section = marker_titles[m - 1] if m else "Introduction"
+        page = max(bisect_right(page_starts, line_idx), 1)
+
+        chunks.append(Chunk(name, section, chunk_text, page, start_char, end_char))
+    return chunks
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model_encoding: str) -> "tiktoken.Encoding":
+    # Cached per process so pool workers load the BPE ranks only once
+    import tiktoken
 
+    return tiktoken.get_encoding(model_encoding)
+
+
+def chunk_pdf(path: str, chunk_size: int, overlap: int, model_encoding: str = DEFAULT_ENCODING) -> List[Chunk]:
+    """Parse and chunk a single PDF. Runs inside extraction pool workers."""
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(path)
+    lines, page_starts = _page_lines(reader)
+    enc = get_encoding(model_encoding)
+    return text_to_token_chunks(os.path.basename(path), lines, page_starts, enc, chunk_size, overlap)
+
+
+def list_pdfs(folder: str) -> List[str]:
     if not os.path.isdir(folder):
         raise FileNotFoundError(f"PDF folder not found: {folder}")
+    return [
+        os.path.join(folder, name)
+        for name in sorted(os.listdir(folder))
+        if name.lower().endswith(".pdf")
+    ]
 
-    for name in sorted(os.listdir(folder)):
-        if not name.lower().endswith(".pdf"):
-            continue
-        path = os.path.join(folder, name)
-        try:
-            reader = PdfReader(path)
-        except Exception as e:
-            print(f"Warning: Failed to read PDF {path}: {e}")
-            continue
 
-        full_text = "\n".join(page.extract_text() or "" for page in reader.pages)
-        lines = [l.strip() for l in full_text.split("\n") if l.strip()]
-
-        section_markers: List[Tuple[int, str]] = []
-        for i, line in enumerate(lines):
-            if SECTION_PATTERN.match(line):
-                section_markers.append((i, line.strip()))
-
-        tokens = enc.encode("\n".join(lines))
-        start = 0
-        while start < len(tokens):
-            chunk_tokens = tokens[start:start + chunk_size]
-            chunk_text = enc.decode(chunk_tokens).strip()
-            if not chunk_text:
-                start += chunk_size - overlap
-                continue
+def iter_pdf_chunks(
+    folder: str,
+    chunk_size: int,
+    overlap: int,
+    workers: Optional[int] = None,
+    model_encoding: str = DEFAULT_ENCODING,
+) -> Iterator[Chunk]:
+    """Yield chunks of every PDF in `folder`, one document at a time.
+
+    With more than one worker, PDFs are parsed in a process pool and their
+    chunks are yielded as each document finishes. A PDF that fails to parse
+    is reported and skipped.
+    """
+    # List eagerly so a missing folder is reported before any work starts
+    paths = list_pdfs(folder)
+    return iter_path_chunks(paths, chunk_size, overlap, workers, model_encoding)
 
-            text_before_chunk = enc.decode(tokens[:start])
-            approx_lines_before = text_before_chunk.count('\n')
-            chunk_section = "Introduction"
-            for line_idx, sect_title in section_markers:
-                if line_idx <= approx_lines_before:
-                    chunk_section = sect_title
-                else:
-                    break
 
-            items.append((name, chunk_section, chunk_text))
-            start += chunk_size - overlap
+def iter_path_chunks(
+    paths: List[str],
+    chunk_size: int,
+    overlap: int,
+    workers: Optional[int] = None,
+    model_encoding: str = DEFAULT_ENCODING,
+    max_pending: Optional[int] = None,
+    failed: Optional[Set[str]] = None,
+) -> Iterator[Chunk]:
+    """Like `iter_pdf_chunks`, for an explicit list of PDF paths.
 
-    return items
+    At most `max_pending` PDFs (default: twice the worker count) are parsed
+    or waiting to be consumed at once, so a slow consumer holds back
+    extraction instead of letting parsed chunks pile up in memory. Paths
+    that could not be read are added to `failed`, if given.
+    """
+    workers = min(workers or 1, len(paths)) or 1
 
+    if workers == 1:
+        for path in paths:
+            try:
+                chunks = chunk_pdf(path, chunk_size, overlap, model_encoding)
+            except Exception as e:
+                print(f"Warning: Failed to read PDF {path}: {e}")
+                if failed is not None:
+                    failed.add(path)
+                continue
+            yield from chunks
+        return
 
+    max_pending = max(max_pending or 2 * workers, workers)
+    queued = iter(paths)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures: Dict[Future, str] = {}
+        while True:
+            for path in queued:
+                futures[pool.submit(chunk_pdf, path, chunk_size, overlap, model_encoding)] = path
+                if len(futures) >= max_pending:
+                    break
+            if not futures:
+                return
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for fut in done:
+                path = futures.pop(fut)
+                try:
+                    chunks = fut.result()
+                except Exception as e:
+                    print(f"Warning: Failed to read PDF {path}: {e}")
+                    if failed is not None:
+                        failed.add(path)
+                    continue
+                yield from chunks
+
+
+def pdf_to_token_chunks(
+    folder: str, chunk_size: int, overlap: int, model_encoding: str = DEFAULT_ENCODING, workers: Optional[int] = None
+) -> List[Chunk]:
+    return list(iter_pdf_chunks(folder, chunk_size, overlap, workers, model_encoding))
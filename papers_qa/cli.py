@@ -1,24 +1,100 @@
-from typing import Optional
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 import os
 import typer
 
-from .config import TOP_K, OLLAMA_MODEL, EMBED_MODEL, FAISS_PATH, METADATA_PATH
-from .faiss_store import FaissStore
-from .embeddings import embed_query
-from .prompt import build_prompt, print_unique_contexts
-from .ollama_client import OllamaClient
+from .config import PDF_FOLDER, TOP_K, OLLAMA_MODEL, EMBED_MODEL, FAISS_PATH, METADATA_PATH, SERVE_HOST, SERVE_PORT, RETRIEVAL_MODE, RETRIEVAL_MODES, BATCH_CONCURRENCY, INDEX_TYPES, COLLECTIONS_PATH, RERANK_DEPTH
+from . import profiling
+
+# faiss, numpy, requests, tiktoken and PyPDF2 are imported inside the commands
+# that need them, so `--help` and argument errors return immediately.
+if TYPE_CHECKING:
+    from .rag import RagPipeline
 
 
 app = typer.Typer(help="PDF Q&A CLI (FAISS retrieval + Ollama Qwen generation)")
+collection_app = typer.Typer(help="Manage named collections that `ask --collection` and `serve --collection` search together.")
+app.add_typer(collection_app, name="collection")
+
+
+def _finish_profile(rec: Optional[profiling.Recorder], out: Optional[str], command: str) -> None:
+    if rec is None:
+        return
+    profiling.disable()
+    print("\n[profile]")
+    print(rec.report())
+    if out:
+        try:
+            rec.export(out, command)
+            print(f"Profile written to {out}.")
+        except OSError as e:
+            print(f"Could not write profile to {out}: {e}")
+
+
+def _open_pipeline(
+    db: Optional[str],
+    data: Optional[str],
+    models: List[str],
+    mode: str = RETRIEVAL_MODE,
+    collections: Optional[List[str]] = None,
+) -> Optional["RagPipeline"]:
+    """Load the index, metadata and BM25 while Ollama readiness is checked on a background thread.
+
+    With `collections`, the named registry entries are searched together
+    instead of the single `db`/`data` index.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from .faiss_store import FaissStore
+    from .ollama_client import OllamaClient
+    from .rag import RagPipeline
+    from .shards import CollectionRegistry, ShardedStore
+
+    ollama = OllamaClient()
+    if collections:
+        if db or data:
+            print("Pass either --collection or --db/--meta, not both.")
+            return None
+        try:
+            store = ShardedStore(CollectionRegistry.load().select(collections))
+        except (KeyError, ValueError) as e:
+            print(e.args[0] if e.args else e)
+            return None
+    else:
+        store = FaissStore(index_path=db or FAISS_PATH, metadata_path=data or METADATA_PATH)
+    try:
+        pipeline = RagPipeline(store, ollama, mode=mode)
+    except RuntimeError as e:
+        print(e)
+        return None
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        ready = pool.submit(ollama.ensure_models, models)
+        try:
+            pipeline.warm()
+        except (FileNotFoundError, RuntimeError) as e:
+            print(f"Cannot load index: {e}")
+            return None
+        try:
+            ready.result()
+        except RuntimeError as e:
+            print(e)
+            return None
+    return pipeline
 
 
-@app.command(help="Index PDFs into FAISS. Use --rebuild to force.")
+@app.command(help="Index PDFs into FAISS. Use --rebuild to force or --incremental to update.")
 def index(
     rebuild: bool = typer.Option(False, help="Recreate index and chunks from scratch"),
+    incremental: bool = typer.Option(False, help="Only embed new or changed PDFs and drop vectors of deleted ones"),
     db: Optional[str] = typer.Option(None, "--db", help="output path to FAISS index.faiss file (overrides env)"),
-    data: Optional[str] = typer.Option(None, "--meta", help="output path to metadata.jsonl (overrides env)"),
+    data: Optional[str] = typer.Option(None, "--meta", help="output path to metadata file; binary, or JSONL if it ends in .jsonl (overrides env)"),
     input: Optional[str] = typer.Option(None, "--input", help="path to input PDFs folder (overrides env)"),
+    index_type: Optional[str] = typer.Option(None, "--type", help="FAISS index type: flat, flat-ip, ivf-flat, ivf-pq, hnsw, sq8 or fp16 (default: PAPERS_QA_INDEX_TYPE)"),
+    workers: Optional[int] = typer.Option(None, "--workers", help="number of PDF extraction processes (default: PAPERS_QA_INDEX_WORKERS or CPU count)"),
+    resume: bool = typer.Option(True, "--resume/--no-resume", help="continue an interrupted build from its last checkpoint, or discard it"),
+    exact_vectors: Optional[bool] = typer.Option(None, "--exact-vectors/--no-exact-vectors", help="also keep float32 vectors in a side file to rescore quantised indexes exactly (default: PAPERS_QA_EXACT_VECTORS)"),
+    profile: bool = typer.Option(False, "--profile", help="print a per-stage timing breakdown when done"),
+    profile_out: Optional[str] = typer.Option(None, "--profile-out", help="export spans and counters: JSON lines if the path ends in .jsonl, Prometheus text otherwise"),
 ) -> None:
+    rec = profiling.enable() if profile or profile_out else None
     try:
         # Resolve paths (CLI flag takes precedence over env/config)
         in_path = input or os.getenv("PAPERS_QA_PDF_FOLDER") or None
@@ -40,48 +116,290 @@ def index(
         os.makedirs(os.path.dirname(os.path.abspath(db_path)) or ".", exist_ok=True)
         os.makedirs(os.path.dirname(os.path.abspath(data_path)) or ".", exist_ok=True)
 
+        from .faiss_store import FaissStore
+
         store = FaissStore(index_path=db_path, metadata_path=data_path)
-        store.build(rebuild=rebuild, folder_path=in_path)
+        store.build(
+            rebuild=rebuild, folder_path=in_path, workers=workers, incremental=incremental, index_type=index_type, resume=resume,
+            exact_vectors=exact_vectors,
+        )
     except Exception as e:
         print(f"Error building index: {e}")
+    finally:
+        _finish_profile(rec, profile_out, "index")
+
 
+@app.command("index-report", help="Compare recall@k and latency of ANN index types against exact search.")
+def index_report(
+    db: Optional[str] = typer.Option(None, "--db", help="path to a flat FAISS index to sample vectors from (overrides env)"),
+    k: int = typer.Option(TOP_K, "--k", help="number of neighbours for recall@k"),
+    queries: int = typer.Option(200, "--queries", help="number of held-out query vectors"),
+    types: str = typer.Option(",".join(INDEX_TYPES[1:]), "--types", help="comma-separated index types to compare"),
+) -> None:
+    import numpy as np
 
-@app.command(help="Ask a question. Starts interactive REPL if no question provided.")
+    from .ann import evaluate_index_types
+    from .faiss_store import FaissStore
+
+    store = FaissStore(index_path=db or FAISS_PATH)
+    try:
+        source = store.load_index()
+        exact = store.exact_vectors()
+        vectors = np.array(exact) if exact is not None else source.reconstruct_n(0, source.ntotal)
+    except RuntimeError as e:
+        print(f"Cannot read vectors from {store.index_path} ({e}). Use a flat or HNSW index, or one built with --exact-vectors.")
+        return
+
+    rows = evaluate_index_types(vectors, kinds=[t.strip() for t in types.split(",") if t.strip()], k=k, n_queries=queries)
+    print(f"{source.ntotal} vectors, d={source.d}, recall@{k} vs exact cosine search")
+    if rows:
+        print(
+            f"'rescored' re-ranks the top {k * RERANK_DEPTH} by exact float32 cosine; "
+            f"'vs f32' is size relative to the {rows[0]['f32_mb']:.2f} MB of raw float32 vectors"
+        )
+    print(
+        f"{'type':<9} {'factory':<18} {'param':<13} {'recall':>7} {'rescored':>8} {'mean ms':>8} {'p95 ms':>8} "
+        f"{'size MB':>8} {'vs f32':>7} {'build s':>8}"
+    )
+    for r in rows:
+        print(
+            f"{r['kind']:<9} {r['factory']:<18} {r['param']:<13} {r['recall']:>7.3f} {r['rescored']:>8.3f} "
+            f"{r['mean_ms']:>8.3f} {r['p95_ms']:>8.3f} {r['size_mb']:>8.2f} {r['size_mb'] / r['f32_mb']:>7.2f} {r['build_s']:>8.2f}"
+        )
+
+
+@app.command(help="Benchmark chunking, embedding, index build, loading, search and generation against a local fake Ollama.")
+def bench(
+    input: Optional[str] = typer.Option(None, "--input", help="PDF folder to benchmark on (default: PAPERS_QA_PDF_FOLDER)"),
+    out: Optional[str] = typer.Option(None, "--out", help="write results as JSON to this file"),
+    baseline: Optional[str] = typer.Option(None, "--baseline", help="results JSON of an earlier run to compare against"),
+    threshold: float = typer.Option(0.2, "--threshold", help="relative change in the bad direction that counts as a regression"),
+    queries: int = typer.Option(200, "--queries", help="number of search queries sampled from the corpus"),
+    index_type: Optional[str] = typer.Option(None, "--type", help="FAISS index type to build (default: PAPERS_QA_INDEX_TYPE)"),
+    workers: Optional[int] = typer.Option(None, "--workers", help="number of PDF extraction processes"),
+    startup_only: bool = typer.Option(False, "--startup-only", help="only measure CLI startup (import and --help time)"),
+    startup_target_ms: Optional[float] = typer.Option(None, "--startup-target-ms", help="fail if `papers-qa --help` takes longer than this"),
+) -> None:
+    from .bench import compare, load_results, run_benchmarks, save_results
+
+    folder = input or PDF_FOLDER
+    if not startup_only and not os.path.isdir(folder):
+        print(f"Input folder not found: {folder}. Pass --input or set PAPERS_QA_PDF_FOLDER.")
+        raise typer.Exit(code=2)
+    try:
+        base = load_results(baseline) if baseline else None
+        results = run_benchmarks(folder, n_queries=queries, workers=workers, index_type=index_type, startup_only=startup_only)
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"Error running benchmarks: {e}")
+        raise typer.Exit(code=2)
+    if out:
+        save_results(results, out)
+
+    meta = results["meta"]
+    if not startup_only:
+        print(f"\n{meta['pdfs']} PDFs, {meta['chunks']} chunks, {meta['queries']} queries, {meta['index_type']} index")
+    if base is None:
+        print(f"{'metric':<30} {'value':>12} unit")
+        for name, m in results["metrics"].items():
+            print(f"{name:<30} {m['value']:>12.3f} {m['unit']}")
+    else:
+        rows = compare(results, base, threshold)
+        print(f"{'metric':<30} {'baseline':>12} {'current':>12} {'change':>8}")
+        for name, old, new, change, regressed in rows:
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{name:<30} {old:>12.3f} {new:>12.3f} {change:>+8.1%}{flag}")
+        regressions = [r[0] for r in rows if r[4]]
+        if regressions:
+            print(f"{len(regressions)} metric(s) regressed by more than {threshold:.0%} vs {baseline}.")
+        else:
+            print(f"No regressions beyond {threshold:.0%} vs {baseline}.")
+
+    help_ms = results["metrics"]["cli_help_ms"]["value"]
+    slow_start = startup_target_ms is not None and help_ms > startup_target_ms
+    if slow_start:
+        print(f"CLI startup took {help_ms:.0f} ms, over the {startup_target_ms:.0f} ms target.")
+    if slow_start or (base is not None and regressions):
+        raise typer.Exit(code=1)
+
+
+@app.command("convert-metadata", help="Convert chunk metadata between JSONL and the binary format (by DST extension).")
+def convert_metadata(
+    src: str = typer.Argument(..., help="existing metadata file (.jsonl or binary)"),
+    dst: str = typer.Argument(..., help="output file; JSONL if it ends in .jsonl, binary otherwise"),
+) -> None:
+    from .metadata_store import convert
+
+    try:
+        n = convert(src, dst)
+    except (OSError, ValueError) as e:
+        print(f"Error converting metadata: {e}")
+        return
+    print(f"Wrote {n} records to {dst}.")
+
+
+@collection_app.command("add", help="Register an index as a named collection, building it first when --input is given.")
+def collection_add(
+    name: str = typer.Argument(..., help="collection name"),
+    db: str = typer.Option(..., "--db", help="path to the collection's FAISS index file"),
+    data: str = typer.Option(..., "--meta", help="path to the collection's metadata file"),
+    input: Optional[str] = typer.Option(None, "--input", help="PDF folder to index into --db/--meta if they don't exist yet"),
+    index_type: Optional[str] = typer.Option(None, "--type", help="FAISS index type used when building"),
+) -> None:
+    from .shards import CollectionRegistry
+
+    if name == "all":
+        print("'all' is reserved for selecting every collection.")
+        return
+    if input and not (os.path.exists(db) and os.path.exists(data)):
+        from .faiss_store import FaissStore
+
+        try:
+            FaissStore(index_path=db, metadata_path=data).build(folder_path=input, index_type=index_type)
+        except Exception as e:
+            print(f"Error building index: {e}")
+            return
+    if not (os.path.exists(db) and os.path.exists(data)):
+        print(f"Index or metadata not found at {db} / {data}. Build it with `papers-qa index` or pass --input.")
+        return
+    registry = CollectionRegistry.load()
+    registry.add(name, db, data)
+    registry.save()
+    print(f"Collection '{name}' registered in {registry.path}.")
+
+
+@collection_app.command("drop", help="Unregister a collection. Its index files are left in place.")
+def collection_drop(name: str = typer.Argument(..., help="collection name")) -> None:
+    from .shards import CollectionRegistry
+
+    registry = CollectionRegistry.load()
+    try:
+        registry.drop(name)
+    except KeyError as e:
+        print(e.args[0])
+        return
+    registry.save()
+    print(f"Collection '{name}' dropped.")
+
+
+@collection_app.command("list", help="List registered collections.")
+def collection_list() -> None:
+    from .shards import CollectionRegistry
+
+    registry = CollectionRegistry.load()
+    if not registry.collections:
+        print(f"No collections registered in {COLLECTIONS_PATH}.")
+        return
+    for name, c in registry.collections.items():
+        print(f"{name}\t{c.index_path}\t{c.metadata_path}")
+
+
+@app.command(help="Serve questions over HTTP with a warm index, streaming answers as NDJSON.")
+def serve(
+    host: str = typer.Option(SERVE_HOST, "--host", help="interface to bind"),
+    port: int = typer.Option(SERVE_PORT, "--port", help="port to listen on"),
+    db: Optional[str] = typer.Option(None, "--db", help="input path to FAISS .faiss file (overrides env)"),
+    data: Optional[str] = typer.Option(None, "--meta", help="input path to metadata file, binary or .jsonl (overrides env)"),
+    collection: Optional[List[str]] = typer.Option(None, "--collection", "-c", help="search these registered collections together (repeatable; 'all' for every one)"),
+) -> None:
+    from .server import run_server
+
+    pipeline = _open_pipeline(db, data, [EMBED_MODEL, OLLAMA_MODEL], collections=collection)
+    if pipeline is None:
+        return
+    run_server(pipeline, host, port)
+
+
+@app.command(help="Ask a question. Starts interactive REPL if no question provided; --batch answers a JSONL file.")
 def ask(
     question: Optional[str] = typer.Argument(None, metavar="[QUESTION]", show_default=False),
     db: Optional[str] = typer.Option(None, "--db", help="input path to FAISS .faiss file (overrides env)"),
-    data: Optional[str] = typer.Option(None, "--meta", help="input path to metadata.jsonl (overrides env)"),
+    data: Optional[str] = typer.Option(None, "--meta", help="input path to metadata file, binary or .jsonl (overrides env)"),
+    mode: str = typer.Option(RETRIEVAL_MODE, "--mode", help="retrieval mode: hybrid, dense or lexical (keyword-only, no embedding call)"),
+    batch: Optional[str] = typer.Option(None, "--batch", help="JSONL file of questions ({\"id\": ..., \"question\": ...} per line) to answer non-interactively"),
+    out: Optional[str] = typer.Option(None, "--out", help="JSONL file for --batch answers; rerunning resumes after the last answered question"),
+    concurrency: int = typer.Option(BATCH_CONCURRENCY, "--concurrency", help="concurrent generations in --batch mode"),
+    collection: Optional[List[str]] = typer.Option(None, "--collection", "-c", help="search only these registered collections (repeatable; 'all' for every one)"),
+    file: Optional[List[str]] = typer.Option(None, "--file", help="only search chunks of matching PDFs: glob or case-insensitive substring (repeatable)"),
+    section: Optional[List[str]] = typer.Option(None, "--section", help="only search chunks of matching sections, e.g. 'conclusion' (repeatable)"),
+    profile: bool = typer.Option(False, "--profile", help="print a per-stage timing breakdown when done"),
+    profile_out: Optional[str] = typer.Option(None, "--profile-out", help="export spans and counters: JSON lines if the path ends in .jsonl, Prometheus text otherwise"),
 ) -> None:
+    rec = profiling.enable() if profile or profile_out else None
     try:
-        ollama = OllamaClient()
-        ollama.ensure_ready()
-        print(f"checking model '{EMBED_MODEL}' (download if missing)...", flush=True)
-        ollama.ensure_model(EMBED_MODEL)
-        print(f"checking model '{OLLAMA_MODEL}' (download if missing)...", flush=True)
-        ollama.ensure_model(OLLAMA_MODEL)
-    except RuntimeError as e:
-        print(e)
-        return
+        _ask(question, db, data, mode, batch, out, concurrency, collection, tuple(file or ()), tuple(section or ()))
+    finally:
+        _finish_profile(rec, profile_out, "ask")
 
+
+def _ask(
+    question: Optional[str],
+    db: Optional[str],
+    data: Optional[str],
+    mode: str,
+    batch: Optional[str],
+    out: Optional[str],
+    concurrency: int,
+    collections: Optional[List[str]] = None,
+    files: Tuple[str, ...] = (),
+    sections: Tuple[str, ...] = (),
+) -> None:
+    if mode not in RETRIEVAL_MODES:
+        print(f"Unknown retrieval mode '{mode}'. Choose one of: {', '.join(RETRIEVAL_MODES)}")
+        return
+    if batch and not out:
+        print("Missing output file. Pass --out with --batch.")
+        return
+    if batch and question:
+        print("Pass either a QUESTION or --batch, not both.")
+        return
     # Allow overriding input index/metadata via CLI
-    store = FaissStore(index_path=db or FAISS_PATH, metadata_path=data or METADATA_PATH)
-    metadata = store.load_metadata()
+    models = [OLLAMA_MODEL] if mode == "lexical" else [EMBED_MODEL, OLLAMA_MODEL]
+    pipeline = _open_pipeline(db, data, models, mode=mode, collections=collections)
+    if pipeline is None:
+        return
+    from .faiss_store import MetadataFilter
+
+    where = MetadataFilter(files, sections)
+    if where and not pipeline.store.filter_mask(where).any():
+        print("No chunks match the --file/--section filters.")
+        return
+
+    if batch:
+        from .batch import run_batch
+
+        try:
+            summary = run_batch(pipeline, batch, out, concurrency=concurrency, where=where)
+        except (OSError, ValueError, RuntimeError) as e:
+            print(f"Error running batch: {e}")
+            return
+        print(
+            f"{summary.answered} answered, {summary.failed} failed, {summary.skipped} already in {out} "
+            f"({summary.total} questions, {summary.elapsed_s:.1f}s)"
+        )
+        return
+
+    from .prompt import print_sources
 
     def run_query(q: str) -> None:
-        qvec = embed_query(q)
-        _, idxx = store.retrieve(qvec, TOP_K)
-        candidates = [(metadata[i][0], metadata[i][1], metadata[i][2]) for i in idxx if 0 <= i < len(metadata)]
-        contexts = candidates
+        try:
+            ids = pipeline.search(q, where=where)
+        except RuntimeError as e:
+            print(e)
+            return
+        contexts = pipeline.contexts(ids)
         if not contexts:
             print("No relevant context found.")
             return
-        print_unique_contexts(contexts)
-        prompt = build_prompt(q, contexts)
+        stats: Dict[str, float] = {}
+        packed = pipeline.pack(contexts, ids, stats)
+        print_sources(pipeline.sources(packed))
         try:
             print("thinking...\n", flush=True)
-            for piece in ollama.stream(prompt):
+            for piece in pipeline.generate(q, contexts, stats, ids=ids, packed=packed):
                 print(piece, end="", flush=True)
             print()
+            if "context_tokens" in stats:
+                print(f"[context: {stats['context_tokens']:.0f} tokens, {stats['context_tokens_saved']:.0f} saved by packing]")
         except RuntimeError as e:
             print(e)
 
@@ -10,7 +10,7 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PDF_FOLDER: str = os.getenv("PAPERS_QA_PDF_FOLDER", "research_papers")
 METADATA_PATH: str = os.getenv(
     "PAPERS_QA_METADATA_PATH",
-    os.path.join(BASE_DIR, "..", "metadata.jsonl"),
+    os.path.join(BASE_DIR, "..", "metadata.bin"),
 )
 FAISS_PATH: str = os.getenv(
     "PAPERS_QA_FAISS_PATH",
@@ -22,9 +22,75 @@ TOP_K: int = int(os.getenv("PAPERS_QA_TOP_K", "10"))
 CHUNK_SIZE: int = int(os.getenv("PAPERS_QA_CHUNK_SIZE", "500"))
 CHUNK_OVERLAP: int = int(os.getenv("PAPERS_QA_CHUNK_OVERLAP", "50"))
 EMBED_BATCH_SIZE: int = int(os.getenv("PAPERS_QA_EMBED_BATCH_SIZE", "64"))
+EMBED_CONCURRENCY: int = int(os.getenv("PAPERS_QA_EMBED_CONCURRENCY", "4"))
 EMBED_MODEL: str = os.getenv("PAPERS_QA_EMBED_MODEL", "nomic-embed-text")
 MAX_EMBED_CHARS: int = int(os.getenv("PAPERS_QA_MAX_EMBED_CHARS", "4000"))
+EMBED_CACHE_PATH: str = os.getenv(
+    "PAPERS_QA_EMBED_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "papers_qa", "embeddings.sqlite"),
+)
+EMBED_CACHE_MAX_ENTRIES: int = int(os.getenv("PAPERS_QA_EMBED_CACHE_MAX_ENTRIES", "200000"))
+QUERY_CACHE_SIZE: int = int(os.getenv("PAPERS_QA_QUERY_CACHE_SIZE", "1024"))
+ANSWER_CACHE_PATH: str = os.getenv(
+    "PAPERS_QA_ANSWER_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "papers_qa", "answers.sqlite"),
+)
+ANSWER_CACHE_TTL: float = float(os.getenv("PAPERS_QA_ANSWER_CACHE_TTL", "86400"))
+# Registry of named collections (index/metadata pairs) that `ask --collection` searches together
+COLLECTIONS_PATH: str = os.getenv(
+    "PAPERS_QA_COLLECTIONS_PATH",
+    os.path.join(os.path.expanduser("~"), ".config", "papers_qa", "collections.json"),
+)
+INDEX_WORKERS: int = int(os.getenv("PAPERS_QA_INDEX_WORKERS", str(os.cpu_count() or 1)))
+# Full builds snapshot the partial index every N chunks so an interrupted build can resume (0 disables)
+CHECKPOINT_CHUNKS: int = int(os.getenv("PAPERS_QA_CHECKPOINT_CHUNKS", "20000"))
+
+# FAISS index type: flat (exact L2), flat-ip (exact cosine), ivf-flat, ivf-pq, hnsw,
+# sq8 / fp16 (cosine over int8 scalar-quantised / half-precision codes)
+INDEX_TYPES = ("flat", "flat-ip", "ivf-flat", "ivf-pq", "hnsw", "sq8", "fp16")
+INDEX_TYPE: str = os.getenv("PAPERS_QA_INDEX_TYPE", "flat-ip")
+# Also keep exact float32 vectors in a memory-mapped `<index>.f32` side file, used to rescore candidates
+EXACT_VECTORS: bool = os.getenv("PAPERS_QA_EXACT_VECTORS", "0").lower() in ("1", "true", "yes")
+IVF_NLIST: int = int(os.getenv("PAPERS_QA_IVF_NLIST", "0"))
+PQ_M: int = int(os.getenv("PAPERS_QA_PQ_M", "16"))
+HNSW_M: int = int(os.getenv("PAPERS_QA_HNSW_M", "32"))
+# Trainable index types learn from this many vectors, reservoir-sampled across the whole build
+TRAIN_SAMPLE: int = int(os.getenv("PAPERS_QA_TRAIN_SAMPLE", "50000"))
+NPROBE: int = int(os.getenv("PAPERS_QA_NPROBE", "16"))
+EF_SEARCH: int = int(os.getenv("PAPERS_QA_EF_SEARCH", "64"))
+
+# Retrieval: dense (FAISS only), lexical (BM25 only) or hybrid (both, fused with reciprocal-rank fusion)
+RETRIEVAL_MODES = ("hybrid", "dense", "lexical")
+RETRIEVAL_MODE: str = os.getenv("PAPERS_QA_RETRIEVAL_MODE", "hybrid")
+FUSION_DEPTH: int = int(os.getenv("PAPERS_QA_FUSION_DEPTH", "3"))
+RRF_K: int = int(os.getenv("PAPERS_QA_RRF_K", "60"))
+BM25_K1: float = float(os.getenv("PAPERS_QA_BM25_K1", "1.2"))
+BM25_B: float = float(os.getenv("PAPERS_QA_BM25_B", "0.75"))
+
+# Reranking: over-fetch TOP_K * RERANK_DEPTH candidates, rescore them by exact cosine
+# (or a cross-encoder given as "module:function"), then keep TOP_K with MMR. Depth <= 1 disables.
+RERANK_DEPTH: int = int(os.getenv("PAPERS_QA_RERANK_DEPTH", "4"))
+MMR_LAMBDA: float = float(os.getenv("PAPERS_QA_MMR_LAMBDA", "0.7"))
+RERANKER: str = os.getenv("PAPERS_QA_RERANKER", "")
+
+# Prompt context packing (token budget counted with tiktoken; <= 0 disables the cap)
+CONTEXT_TOKEN_BUDGET: int = int(os.getenv("PAPERS_QA_CONTEXT_TOKEN_BUDGET", "3000"))
+CONTEXT_DEDUP_THRESHOLD: float = float(os.getenv("PAPERS_QA_CONTEXT_DEDUP_THRESHOLD", "0.9"))
 
 # Ollama
 OLLAMA_HOST: str = os.getenv("PAPERS_QA_OLLAMA_HOST", "http://localhost:11434")
-OLLAMA_MODEL: str = os.getenv("PAPERS_QA_OLLAMA_MODEL", "qwen3:latest")
\ No newline at end of file
+OLLAMA_MODEL: str = os.getenv("PAPERS_QA_OLLAMA_MODEL", "qwen3:latest")
+# Models seen on a host are not re-checked for this many seconds (0 disables the on-disk cache)
+MODEL_CHECK_TTL: float = float(os.getenv("PAPERS_QA_MODEL_CHECK_TTL", "300"))
+MODEL_CHECK_CACHE_PATH: str = os.getenv(
+    "PAPERS_QA_MODEL_CHECK_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "papers_qa", "models.json"),
+)
+
+# Query server
+SERVE_HOST: str = os.getenv("PAPERS_QA_SERVE_HOST", "127.0.0.1")
+SERVE_PORT: int = int(os.getenv("PAPERS_QA_SERVE_PORT", "8000"))
+SERVE_WORKERS: int = int(os.getenv("PAPERS_QA_SERVE_WORKERS", "32"))
+
+# Batch answering (ask --batch): concurrent generations sent to Ollama
+BATCH_CONCURRENCY: int = int(os.getenv("PAPERS_QA_BATCH_CONCURRENCY", "4"))
@@ -0,0 +1,134 @@
+import atexit
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from .config import EMBED_CACHE_PATH, EMBED_CACHE_MAX_ENTRIES
+
+# A hit only refreshes an entry's LRU time when it is older than this
+TOUCH_INTERVAL_S = 60.0
+# Pending LRU refreshes are written once this many have accumulated
+TOUCH_BATCH = 1000
+
+
+def cache_key(model: str, text: str) -> bytes:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).digest()
+
+
+@dataclass(slots=True)
+class EmbeddingCache:
+    """On-disk SQLite cache of embeddings keyed by (model, text).
+
+    Vectors are stored as raw float32 bytes. Once more than `max_entries`
+    rows are stored, the least recently used tenth is evicted. Reads don't
+    write: hits queue an LRU refresh in memory, which is written with the
+    next `put_many`, every `TOUCH_BATCH` refreshes, or on `flush`/`close`.
+    """
+    path: str
+    max_entries: int = 200_000
+    hits: int = field(default=0, init=False)
+    misses: int = field(default=0, init=False)
+    _conn: sqlite3.Connection = field(init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+    _count: int = field(default=0, init=False, repr=False)
+    _touched: Dict[bytes, float] = field(default_factory=dict, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vec BLOB NOT NULL, used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_used ON embeddings(used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, keys: Sequence[bytes]) -> Dict[bytes, np.ndarray]:
+        found: Dict[bytes, np.ndarray] = {}
+        if not keys:
+            return found
+        now = time.time()
+        with self._lock:
+            # SQLite caps bound parameters, so look keys up in slices
+            for i in range(0, len(keys), 500):
+                part = list(keys[i:i + 500])
+                marks = ",".join("?" * len(part))
+                for key, blob, used in self._conn.execute(
+                    f"SELECT key, vec, used FROM embeddings WHERE key IN ({marks})", part
+                ):
+                    found[key] = np.frombuffer(blob, dtype="float32")
+                    if now - used > TOUCH_INTERVAL_S:
+                        self._touched[key] = now
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+            if len(self._touched) >= TOUCH_BATCH:
+                self._write_touches()
+                self._conn.commit()
+        return found
+
+    def _write_touches(self) -> None:
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET used = ? WHERE key = ?", [(t, k) for k, t in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def flush(self) -> None:
+        """Write pending LRU refreshes."""
+        with self._lock:
+            try:
+                self._write_touches()
+                self._conn.commit()
+            except sqlite3.ProgrammingError:
+                pass  # already closed
+
+    def put_many(self, keys: Sequence[bytes], vecs: np.ndarray) -> None:
+        if not len(keys):
+            return
+        now = time.time()
+        rows = [(k, np.ascontiguousarray(v, dtype="float32").tobytes(), now) for k, v in zip(keys, vecs)]
+        with self._lock:
+            # Eviction below must see the latest use of every entry
+            self._write_touches()
+            before = self._conn.total_changes
+            self._conn.executemany("INSERT OR IGNORE INTO embeddings (key, vec, used) VALUES (?, ?, ?)", rows)
+            self._count += self._conn.total_changes - before
+            if self._count > self.max_entries:
+                excess = self._count - int(self.max_entries * 0.9)
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY used LIMIT ?)",
+                    (excess,),
+                )
+                self._count -= excess
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": self._count}
+
+    def close(self) -> None:
+        with self._lock:
+            self._write_touches()
+            self._conn.commit()
+            self._conn.close()
+
+
+_default_cache: Optional[EmbeddingCache] = None
+
+
+def get_cache() -> Optional[EmbeddingCache]:
+    """Shared cache from config, or None when disabled (empty PAPERS_QA_EMBED_CACHE_PATH)."""
+    global _default_cache
+    if not EMBED_CACHE_PATH:
+        return None
+    if _default_cache is None:
+        _default_cache = EmbeddingCache(EMBED_CACHE_PATH, EMBED_CACHE_MAX_ENTRIES)
+        atexit.register(_default_cache.flush)
+    return _default_cache
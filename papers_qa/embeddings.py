@@ -1,30 +1,205 @@
-from typing import Iterator, List
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
 import numpy as np
 import requests
-from .config import EMBED_BATCH_SIZE, EMBED_MODEL, OLLAMA_HOST, MAX_EMBED_CHARS
+from requests.adapters import HTTPAdapter
+from . import profiling
+from .config import EMBED_BATCH_SIZE, EMBED_CONCURRENCY, EMBED_MODEL, OLLAMA_HOST, MAX_EMBED_CHARS
+from .embed_cache import EmbeddingCache, cache_key, get_cache
+from .ollama_client import OllamaClient, model_missing, model_presence
 
+T = TypeVar("T")
 
-def embed_text(text: str, retries: int = 2) -> np.ndarray:
-    payload = {"model": EMBED_MODEL, "prompt": text[:MAX_EMBED_CHARS]}
-    last_exc = None
-    for _ in range(retries + 1):
+
+class EmbedderUnavailable(RuntimeError):
+    """Ollama could not be reached, so no text can be embedded; retrying item by item won't help."""
+
+
+@dataclass(slots=True)
+class EmbeddingClient:
+    """Batched Ollama embeddings over a pooled HTTP session.
+
+    Texts are sent to `/api/embed` `batch_size` at a time, with up to
+    `concurrency` batches in flight. Ollama returns unit-norm vectors.
+    With a `cache`, only texts missing from it are sent, and `prepare`
+    (e.g. starting the daemon) runs once before the first request. If
+    `prepare` fails, every later request re-raises that failure as
+    `EmbedderUnavailable` without running it again.
+    """
+    host: str = OLLAMA_HOST
+    model: str = EMBED_MODEL
+    batch_size: int = EMBED_BATCH_SIZE
+    concurrency: int = EMBED_CONCURRENCY
+    retries: int = 3
+    backoff_s: float = 0.5
+    timeout_s: int = 120
+    cache: Optional[EmbeddingCache] = None
+    prepare: Optional[Callable[[], None]] = None
+    _session: requests.Session = field(init=False, repr=False)
+    _prepared: bool = field(default=False, init=False, repr=False)
+    _prepare_error: Optional[Exception] = field(default=None, init=False, repr=False)
+    _prepare_lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(self.concurrency, 1))
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    def embed_batch(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed `texts` in one request, retrying with exponential backoff."""
+        self._ensure_prepared()
+        payload = {"model": self.model, "input": [t[:MAX_EMBED_CHARS] for t in texts]}
+        profiling.count("embed.texts", len(texts))
+        with profiling.span("embed.request"):
+            return self._post_with_retries(payload, len(texts))
+
+    def _post_with_retries(self, payload: dict, n: int) -> np.ndarray:
+        last_exc: Optional[Exception] = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.backoff_s * (2 ** (attempt - 1)))
+            try:
+                r = self._session.post(f"{self.host}/api/embed", json=payload, timeout=self.timeout_s)
+                if model_missing(r):
+                    self._restore_model()
+                    r = self._session.post(f"{self.host}/api/embed", json=payload, timeout=self.timeout_s)
+                r.raise_for_status()
+                vecs = np.array(r.json().get("embeddings", []), dtype="float32")
+                if vecs.ndim != 2 or vecs.shape[0] != n:
+                    raise ValueError(f"expected {n} embeddings, got shape {vecs.shape}")
+                return vecs
+            except (requests.RequestException, ValueError) as e:
+                last_exc = e
+        if isinstance(last_exc, (requests.ConnectionError, requests.Timeout)):
+            raise EmbedderUnavailable(f"Ollama embedding failed: {last_exc}") from last_exc
+        raise RuntimeError(f"Ollama embedding failed: {last_exc}") from last_exc
+
+    def embed_cached(self, texts: Sequence[str]) -> np.ndarray:
+        """Like `embed_batch`, serving what it can from the cache."""
+        if self.cache is None:
+            return self.embed_batch(texts)
+        keys = [cache_key(self.model, t[:MAX_EMBED_CHARS]) for t in texts]
+        found = self.cache.get_many(keys)
+        missing = [i for i, k in enumerate(keys) if k not in found]
+        profiling.count("embed.cache_hits", len(keys) - len(missing))
+        if missing:
+            fresh = self.embed_batch([texts[i] for i in missing])
+            self.cache.put_many([keys[i] for i in missing], fresh)
+            for i, vec in zip(missing, fresh):
+                found[keys[i]] = vec
+        return np.vstack([found[k] for k in keys])
+
+    def _ensure_prepared(self) -> None:
+        if self._prepared or self.prepare is None:
+            return
+        with self._prepare_lock:
+            if self._prepare_error is None and not self._prepared:
+                try:
+                    self.prepare()
+                    self._prepared = True
+                except Exception as e:
+                    self._prepare_error = e
+            if self._prepare_error is not None:
+                raise EmbedderUnavailable(str(self._prepare_error)) from self._prepare_error
+
+    def _restore_model(self) -> None:
+        # The model presence cache was stale (model removed or daemon reset): check again and pull it
+        with self._prepare_lock:
+            model_presence.forget(self.host)
+            try:
+                OllamaClient(host=self.host).ensure_models([self.model])
+            except RuntimeError as e:
+                raise EmbedderUnavailable(str(e)) from e
+
+    def _embed_tolerant(self, items: List[T], key: Callable[[T], str]) -> Tuple[List[T], Optional[np.ndarray]]:
+        # A batch Ollama rejected is retried item by item so one bad text doesn't drop its neighbours.
+        # EmbedderUnavailable (daemon unreachable) is not caught: no item would get through either.
         try:
-            r = requests.post(f"{OLLAMA_HOST}/api/embeddings", json=payload, timeout=120)
-            r.raise_for_status()
-            data = r.json()
-            vec = np.array(data.get("embedding", []), dtype="float32")
-            return vec if vec.ndim == 1 else vec.reshape(-1)
-        except Exception as e:
-            last_exc = e
-    raise last_exc  # type: ignore[misc]
+            return items, self.embed_cached([key(it) for it in items])
+        except EmbedderUnavailable:
+            raise
+        except RuntimeError:
+            if len(items) == 1:
+                return [], None
+        kept: List[T] = []
+        vecs: List[np.ndarray] = []
+        for it in items:
+            try:
+                vecs.append(self.embed_cached([key(it)])[0])
+                kept.append(it)
+            except EmbedderUnavailable:
+                raise
+            except RuntimeError:
+                continue
+        return kept, (np.vstack(vecs) if vecs else None)
+
+    def embed_stream(
+        self, items: Iterable[T], key: Callable[[T], str] = str, batch_size: Optional[int] = None
+    ) -> Iterator[Tuple[List[T], np.ndarray]]:
+        """Embed a stream of items, yielding `(batch_items, vectors)` in input order.
+
+        Items whose text Ollama rejects are left out of `batch_items`. If
+        Ollama can't be reached, `EmbedderUnavailable` ends the stream and
+        batches not yet started are cancelled.
+        """
+        batch_size = batch_size or self.batch_size
+        pending: Deque[Future] = deque()
+        with ThreadPoolExecutor(max_workers=max(self.concurrency, 1)) as pool:
+            try:
+                batch: List[T] = []
+                for it in items:
+                    batch.append(it)
+                    if len(batch) >= batch_size:
+                        pending.append(pool.submit(self._embed_tolerant, batch, key))
+                        batch = []
+                        # Keep at most `concurrency` batches in flight
+                        while len(pending) > self.concurrency:
+                            kept, vecs = pending.popleft().result()
+                            if vecs is not None:
+                                yield kept, vecs
+                if batch:
+                    pending.append(pool.submit(self._embed_tolerant, batch, key))
+                while pending:
+                    kept, vecs = pending.popleft().result()
+                    if vecs is not None:
+                        yield kept, vecs
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def close(self) -> None:
+        self._session.close()
+
+
+_default_client: Optional[EmbeddingClient] = None
+
+
+def get_client() -> EmbeddingClient:
+    global _default_client
+    if _default_client is None:
+        _default_client = EmbeddingClient(cache=get_cache())
+    return _default_client
+
+
+def embed_text(text: str) -> np.ndarray:
+    return get_client().embed_cached([text])[0]
 
 
 def embed_texts_batched(texts: List[str], batch_size: int = EMBED_BATCH_SIZE) -> Iterator[np.ndarray]:
+    client = get_client()
     for i in range(0, len(texts), batch_size):
-        batch = texts[i:i + batch_size]
-        for t in batch:
-            yield embed_text(t)
+        yield from client.embed_cached(texts[i:i + batch_size])
 
 
 def embed_query(query: str) -> np.ndarray:
     return embed_text(query)[None, :]
+
+
+def embed_queries(queries: List[str]) -> np.ndarray:
+    """Embed many queries in batched requests; one row per query."""
+    return np.vstack(list(embed_texts_batched(queries)))
@@ -1,140 +1,617 @@
-import json
 import os
+from fnmatch import fnmatchcase
+from functools import partial
 from dataclasses import dataclass, field
 from importlib import resources
-from typing import List, Tuple, Optional
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
 import numpy as np
 import faiss
-from tqdm import tqdm
 
-from .config import PDF_FOLDER, CHUNK_SIZE, CHUNK_OVERLAP, FAISS_PATH, METADATA_PATH, TOP_K, EMBED_MODEL
-from .chunking import pdf_to_token_chunks
-from .embeddings import embed_texts_batched, embed_text
+from . import profiling
+from .config import (
+    PDF_FOLDER, CHUNK_SIZE, CHUNK_OVERLAP, FAISS_PATH, METADATA_PATH, TOP_K, EMBED_MODEL, INDEX_WORKERS, OLLAMA_HOST,
+    CHECKPOINT_CHUNKS, EXACT_VECTORS,
+)
+from .bm25 import BM25Index
+from .ann import (
+    IndexBuilder, IndexSpec, configure_search, enable_reconstruct, index_kind, normalized, search_parameters, uses_inner_product,
+)
+from .checkpoint import BuildCheckpoint
+from .chunking import DEFAULT_ENCODING, Chunk, iter_path_chunks, list_pdfs
+from .embeddings import EmbeddingClient, get_client
+from .metadata_store import (
+    MetadataStore, MetadataWriter, is_binary, iter_records, load_jsonl, load_locations, open_writer, row_groups,
+)
+from .manifest import FileEntry, Manifest, file_sha256, is_unchanged, manifest_path_for
 from .ollama_client import OllamaClient
+from .vector_file import VectorWriter, open_vectors, vectors_path_for
+
+
+def read_index_mmap(path: str) -> faiss.Index:
+    """Read a FAISS index for querying, memory-mapping its vector codes where faiss supports it."""
+    flag = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+    if flag is not None:
+        try:
+            return faiss.read_index(path, flag | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            pass
+    return faiss.read_index(path)
+
+
+def _matches(name: str, patterns: Sequence[str]) -> bool:
+    # Glob patterns match the whole name; anything else is a case-insensitive substring
+    lowered = name.lower()
+    return any(
+        fnmatchcase(lowered, p.lower()) if any(c in p for c in "*?[") else p.lower() in lowered
+        for p in patterns
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class MetadataFilter:
+    """Restricts retrieval to chunks of matching files and sections.
+
+    Each pattern is a glob (`2510.07*.pdf`) or a case-insensitive substring
+    (`conclusion`). A chunk must match one of the `files` patterns, if any,
+    and one of the `sections` patterns, if any.
+    """
+    files: Tuple[str, ...] = ()
+    sections: Tuple[str, ...] = ()
+
+    def __bool__(self) -> bool:
+        return bool(self.files or self.sections)
 
 
 @dataclass(slots=True)
 class FaissStore:
     index_path: str = FAISS_PATH
     metadata_path: str = METADATA_PATH
+    embedder: Optional[EmbeddingClient] = None
     _index: Optional[faiss.Index] = field(default=None, init=False)
-    _metadata: Optional[List[Tuple[str, str, str]]] = field(default=None, init=False)
+    _metadata: Optional[Sequence[Tuple[str, str, str]]] = field(default=None, init=False)
+    _bm25: Optional[BM25Index] = field(default=None, init=False)
+    _bm25_loaded: bool = field(default=False, init=False)
+    _row_groups: Dict[str, Dict[str, np.ndarray]] = field(default_factory=dict, init=False)
+    _masks: Dict[MetadataFilter, np.ndarray] = field(default_factory=dict, init=False)
+    _exact: Optional[np.ndarray] = field(default=None, init=False)
+    _exact_loaded: bool = field(default=False, init=False)
+    _locations: Optional[np.ndarray] = field(default=None, init=False)
 
-    def build(self, rebuild: bool = False, folder_path: Optional[str] = None) -> None:
-        if (not rebuild) and os.path.exists(self.index_path) and os.path.exists(self.metadata_path):
-            print("Index exists. Use --rebuild to recreate.")
+    @property
+    def manifest_path(self) -> str:
+        return manifest_path_for(self.index_path)
+
+    @property
+    def vectors_path(self) -> str:
+        return vectors_path_for(self.index_path)
+
+    @property
+    def bm25_path(self) -> str:
+        return f"{os.path.splitext(self.index_path)[0]}.bm25.npz"
+
+    def build(
+        self,
+        rebuild: bool = False,
+        folder_path: Optional[str] = None,
+        workers: Optional[int] = None,
+        incremental: bool = False,
+        index_type: Optional[str] = None,
+        resume: bool = True,
+        exact_vectors: Optional[bool] = None,
+    ) -> None:
+        """Build the index from scratch, or update it in place with `incremental`.
+
+        Full builds stream PDFs through extraction, embedding and indexing
+        and snapshot their progress every `CHECKPOINT_CHUNKS` chunks. If a
+        build is interrupted, the next one resumes from the last snapshot
+        (unless `resume` is False), skipping PDFs it already covers.
+        With `exact_vectors` (default `EXACT_VECTORS`), float32 copies of
+        the vectors are also written to `vectors_path` so a quantised index
+        can be rescored exactly.
+        """
+        exact = EXACT_VECTORS if exact_vectors is None else exact_vectors
+        with profiling.span("build.total"):
+            self._build(rebuild, folder_path, workers, incremental, index_type, resume, exact)
+
+    def _build(
+        self,
+        rebuild: bool,
+        folder_path: Optional[str],
+        workers: Optional[int],
+        incremental: bool,
+        index_type: Optional[str],
+        resume: bool,
+        exact: bool,
+    ) -> None:
+        exists = os.path.exists(self.index_path) and os.path.exists(self.metadata_path)
+        if incremental and exists and not rebuild:
+            self.update(folder_path=folder_path, workers=workers)
+            return
+        if (not rebuild) and exists:
+            print("Index exists. Use --rebuild to recreate or --incremental to update it.")
             return
 
+        spec = IndexSpec(kind=index_type) if index_type else IndexSpec()
         src_folder = folder_path or PDF_FOLDER
-        items = pdf_to_token_chunks(src_folder, CHUNK_SIZE, CHUNK_OVERLAP)
-        if not items:
+        paths = list_pdfs(src_folder)
+
+        if rebuild:
+            for path in (self.index_path, self.metadata_path, self.manifest_path, self.bm25_path, self.vectors_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+        checkpoint = BuildCheckpoint(self.index_path, self.metadata_path)
+        state = checkpoint.load() if resume else None
+        params = (CHUNK_SIZE, CHUNK_OVERLAP, DEFAULT_ENCODING, EMBED_MODEL)
+        by_name = {os.path.basename(p): p for p in paths}
+        if state is not None and (state.kind != spec.kind or state.exact_vectors != exact or not all(
+            name in by_name and is_unchanged(entry, by_name[name], params) for name, entry in state.manifest.files.items()
+        )):
+            print("Discarding build checkpoint: index type, settings or PDFs changed since it was written.")
+            state = None
+        if state is None:
+            checkpoint.clear()
+            manifest, index, writer_state = Manifest(), None, None
+        else:
+            manifest, index, writer_state = state.manifest, state.index, state.writer
+            paths = [p for p in paths if os.path.basename(p) not in manifest.files]
+            print(f"Resuming build from checkpoint: {index.ntotal} vectors from {len(manifest.files)} PDF(s) kept.")
+
+        jsonl = self.metadata_path.endswith(".jsonl")
+        vectors_out = None
+        if exact:
+            vectors_out = VectorWriter(
+                checkpoint.partial_vectors_path,
+                rows=None if index is None else index.ntotal,
+                dim=0 if index is None else index.d,
+            )
+        try:
+            with open_writer(checkpoint.partial_metadata_path, jsonl=jsonl, state=writer_state) as meta_out:
+                index = self._embed_files(paths, index, meta_out, manifest, workers, spec, checkpoint, vectors_out)
+        finally:
+            if vectors_out is not None:
+                vectors_out.close()
+
+        if index is None:
             raise RuntimeError("No PDF chunks found.")
+        index_tmp = f"{self.index_path}.tmp"
+        with profiling.span("build.write_index"):
+            faiss.write_index(index, index_tmp)
+        os.replace(index_tmp, self.index_path)
+        os.replace(checkpoint.partial_metadata_path, self.metadata_path)
+        if exact:
+            os.replace(checkpoint.partial_vectors_path, self.vectors_path)
+        elif os.path.exists(self.vectors_path):
+            os.remove(self.vectors_path)
+        manifest.save(self.manifest_path)
+        checkpoint.clear()
+        self._write_bm25()
+        self._reset_cached()
+        self._index = index
+        # don't load metadata into memory here; leave lazy
+        print(f"Built {index_kind(index)} index with {index.ntotal} vectors. Metadata at {self.metadata_path}.")
+
+    def _reset_cached(self) -> None:
+        self._index = None
+        self._metadata = None
+        self._row_groups.clear()
+        self._masks.clear()
+        self._exact, self._exact_loaded = None, False
+        self._locations = None
+
+    def update(self, folder_path: Optional[str] = None, workers: Optional[int] = None) -> None:
+        """Embed only new or changed PDFs and drop the vectors of deleted ones."""
+        manifest = Manifest.load(self.manifest_path)
+        if manifest is None:
+            raise RuntimeError(
+                f"No index manifest at {self.manifest_path}. Run `papers-qa index --rebuild` once to create it."
+            )
+
+        src_folder = folder_path or PDF_FOLDER
+        paths = {os.path.basename(p): p for p in list_pdfs(src_folder)}
+        params = (CHUNK_SIZE, CHUNK_OVERLAP, DEFAULT_ENCODING, EMBED_MODEL)
+        unchanged = {
+            name for name, entry in manifest.files.items()
+            if name in paths and entry.complete and is_unchanged(entry, paths[name], params)
+        }
+        stale = [name for name in manifest.files if name not in unchanged]
+        todo = [path for name, path in paths.items() if name not in unchanged]
+        if not stale and not todo:
+            print("Index is up to date.")
+            return
+        deleted = [name for name in stale if name not in paths]
+        print(f"Updating index: {len(todo)} new or changed PDF(s), {len(deleted)} deleted.")
+
+        index = faiss.read_index(self.index_path)
+        ranges = [np.arange(manifest.files[name].start_id, manifest.files[name].end_id, dtype="int64") for name in stale]
+        removed = np.sort(np.concatenate(ranges)) if ranges else np.empty(0, dtype="int64")
+        keep = np.ones(index.ntotal, dtype=bool)
+        keep[removed] = False
+        if removed.size:
+            if not isinstance(faiss.downcast_index(index), faiss.IndexFlatCodes):
+                raise RuntimeError(
+                    "Removing PDFs incrementally is only supported for flat, sq8 and fp16 indexes. Use --rebuild "
+                    "(cached embeddings make it cheap)."
+                )
+            # Flat-coded indexes compact on removal, so vector i keeps matching metadata row i
+            index.remove_ids(removed)
+        for name in stale:
+            del manifest.files[name]
+        for entry in manifest.files.values():
+            shift = int(np.searchsorted(removed, entry.start_id))
+            entry.start_id -= shift
+            entry.end_id -= shift
 
+        # An existing exact-vectors side file is compacted the same way and extended with the new PDFs
+        exact = open_vectors(self.vectors_path, index.d, keep.shape[0])
+        vectors_tmp = f"{self.vectors_path}.tmp"
+        meta_tmp = f"{self.metadata_path}.tmp"
+        with open_writer(meta_tmp, jsonl=not is_binary(self.metadata_path)) as meta_out:
+            for i, record in enumerate(iter_records(self.metadata_path)):
+                if keep[i]:
+                    meta_out.append(record)
+            vectors_out = None if exact is None else VectorWriter(vectors_tmp)
+            try:
+                if vectors_out is not None:
+                    for lo in range(0, keep.shape[0], 65536):
+                        vectors_out.append(exact[lo:lo + 65536][keep[lo:lo + 65536]])
+                if todo:
+                    index = self._embed_files(todo, index, meta_out, manifest, workers, vectors_out=vectors_out)
+            finally:
+                if vectors_out is not None:
+                    vectors_out.close()
+        del exact
+
+        index_tmp = f"{self.index_path}.tmp"
+        with profiling.span("build.write_index"):
+            faiss.write_index(index, index_tmp)
+        os.replace(index_tmp, self.index_path)
+        os.replace(meta_tmp, self.metadata_path)
+        if os.path.exists(vectors_tmp):
+            os.replace(vectors_tmp, self.vectors_path)
+        elif os.path.exists(self.vectors_path):
+            # A side file that no longer matches the index would be misleading
+            os.remove(self.vectors_path)
+        manifest.save(self.manifest_path)
+        self._write_bm25()
+        self._reset_cached()
+        self._index = index
+        print(f"Index now holds {index.ntotal} vectors. Metadata at {self.metadata_path}.")
+
+    def build_bm25(self) -> BM25Index:
+        """Build and save the BM25 index from the stored metadata, e.g. for an index built without one."""
+        self._write_bm25()
+        return self._bm25  # type: ignore[return-value]
+
+    def _write_bm25(self) -> None:
+        # Lexical index over the final metadata, so vector IDs and BM25 doc IDs always agree
+        with profiling.span("build.bm25"):
+            bm25 = BM25Index.build(str(r["chunk"]) for r in iter_records(self.metadata_path))
+            tmp = f"{self.bm25_path}.tmp"
+            bm25.save(tmp)
+        os.replace(tmp, self.bm25_path)
+        self._bm25, self._bm25_loaded = bm25, True
+
+    def _ensure_embed_model(self, host: str = OLLAMA_HOST) -> None:
         # Ensure Ollama is ready and the embedding model is present
         try:
-            oc = OllamaClient()
-            oc.ensure_ready()
-            print(f"checking model '{EMBED_MODEL}' (download if missing)...", flush=True)
-            oc.ensure_model(EMBED_MODEL)
+            OllamaClient(host=host).ensure_models([EMBED_MODEL])
         except Exception as e:
             raise RuntimeError(f"Ollama embeddings not available ({e}). Ensure Ollama is running and model '{EMBED_MODEL}' exists.")
 
-        index: Optional[faiss.IndexFlatL2] = None
-        buffer: List[np.ndarray] = []
-        emb_dim: Optional[int] = None
+    def _embed_files(
+        self,
+        paths: List[str],
+        index: Optional[faiss.Index],
+        meta_out: MetadataWriter,
+        manifest: Manifest,
+        workers: Optional[int],
+        spec: Optional[IndexSpec] = None,
+        checkpoint: Optional[BuildCheckpoint] = None,
+        vectors_out: Optional[VectorWriter] = None,
+    ) -> Optional[faiss.Index]:
+        """Chunk and embed `paths`, appending to `index`/`meta_out` and recording ID ranges in `manifest`.
 
-        if rebuild:
-            if os.path.exists(self.index_path):
-                os.remove(self.index_path)
-            if os.path.exists(self.metadata_path):
-                os.remove(self.metadata_path)
-
-        total = len(items)
-        with open(self.metadata_path, "w", encoding="utf-8") as meta_out:
-            pbar = tqdm(total=total, desc="Indexing", unit="chunk")
-            for file_name, section, chunk_text in items:
-                try:
-                    vec = embed_text(chunk_text)
-                except Exception:
-                    # Skip problematic chunk
-                    pbar.update(1)
-                    continue
-
-                if emb_dim is None:
-                    emb_dim = vec.shape[0]
-                    index = faiss.IndexFlatL2(emb_dim)
-
-                buffer.append(vec)
-                meta_out.write(json.dumps({"file": file_name, "section": section, "chunk": chunk_text}) + "\n")
-                pbar.update(1)
-
-                if len(buffer) >= 256:
-                    mat = np.vstack(buffer).astype("float32")
-                    index.add(mat)
-                    buffer.clear()
-
-            if buffer:
-                mat = np.vstack(buffer).astype("float32")
-                index.add(mat)
-            pbar.close()
+        Every stage is bounded: extraction keeps a few PDFs in flight,
+        `embed_stream` a few batches, and vectors go straight into the
+        index. With a `checkpoint`, progress is snapshotted at the first PDF
+        boundary after every `CHECKPOINT_CHUNKS` chunks (once a trainable
+        index has been trained, since vectors buffered for training are not
+        part of a snapshot). `vectors_out` receives each vector as it is
+        added to the index.
 
-        if index is None:
-            raise RuntimeError("FAISS index was not initialized")
-        faiss.write_index(index, self.index_path)
-        self._index = index
-        # don't load metadata into memory here; leave lazy
-        print(f"Built index with {index.ntotal} vectors. Metadata at {self.metadata_path}.")
+        PDFs that yield no text are recorded with an empty ID range so
+        updates skip them until they change. PDFs whose chunks were only
+        partly embedded are recorded as incomplete, and PDFs that fail to
+        parse or have no chunk embedded are left out of `manifest`, so
+        updates retry both.
+        """
+        failed: Set[str] = set()
+        chunked: Dict[str, int] = {}
+        incomplete: List[str] = []
+
+        def note(chunks: Iterator[Chunk]) -> Iterator[Chunk]:
+            for c in chunks:
+                chunked[c.file] = chunked.get(c.file, 0) + 1
+                yield c
+
+        def record(name: str) -> None:
+            # Chunks `embed_stream` dropped are missing from the range
+            start, end = ranges[name]
+            complete = end - start == chunked[name]
+            if not complete:
+                incomplete.append(name)
+            self._record_file(manifest, by_name[name], ranges[name], complete)
+
+        # Chunks are streamed from the extraction pool as each PDF finishes
+        items = note(iter_path_chunks(paths, CHUNK_SIZE, CHUNK_OVERLAP, workers=workers or INDEX_WORKERS, failed=failed))
+        # Time the embedder spends blocked on PDF extraction
+        items = profiling.timed_iter("build.extract_wait", items)
+        next_id = index.ntotal if index is not None else 0
+        spec = spec or IndexSpec()
+        builder = IndexBuilder(spec, index=index, sink=None if vectors_out is None else vectors_out.append)
+        ranges: Dict[str, List[int]] = {}
+        by_name = {os.path.basename(p): p for p in paths}
+        current: Optional[str] = None
+        since_checkpoint = 0
+
+        client = self.embedder or get_client()
+        if client.prepare is None:
+            # Ollama is only started/checked once an embedding is missing from the cache
+            client.prepare = partial(self._ensure_embed_model, client.host)
+        from tqdm import tqdm
+
+        pbar = tqdm(desc="Indexing", unit="chunk")
+        for batch, vecs in client.embed_stream(items, key=lambda c: c.text):
+            added = 0
+            for j, item in enumerate(batch):
+                if item.file != current:
+                    # Each PDF's chunks arrive contiguously, so `current` is now complete
+                    if current is not None:
+                        record(current)
+                        if checkpoint is not None and CHECKPOINT_CHUNKS > 0 and since_checkpoint >= CHECKPOINT_CHUNKS:
+                            if j > added:
+                                with profiling.span("build.index_add"):
+                                    builder.add(vecs[added:j])
+                                added = j
+                            if builder.index is not None:
+                                with profiling.span("build.checkpoint"):
+                                    if vectors_out is not None:
+                                        vectors_out.checkpoint()
+                                    checkpoint.save(
+                                        index_kind(builder.index),
+                                        builder.index,
+                                        manifest,
+                                        meta_out.checkpoint(),
+                                        vectors_out is not None,
+                                    )
+                                since_checkpoint = 0
+                    current = item.file
+                meta_out.append({
+                    "file": item.file,
+                    "section": item.section,
+                    "chunk": item.text,
+                    "page": item.page,
+                    "start": item.start_char,
+                    "end": item.end_char,
+                })
+                ranges.setdefault(item.file, [next_id, next_id])[1] = next_id + 1
+                next_id += 1
+            with profiling.span("build.index_add"):
+                builder.add(vecs[added:])
+            since_checkpoint += len(batch)
+            pbar.update(len(batch))
+            profiling.count("build.chunks", len(batch))
+        pbar.close()
+        if current is not None:
+            record(current)
+        empty = [p for p in paths if os.path.basename(p) not in chunked and p not in failed]
+        for path in empty:
+            self._record_file(manifest, path, [next_id, next_id])
+        if empty:
+            print(f"{len(empty)} PDF(s) have no text; recorded so updates skip them until they change.")
+        dropped = incomplete + [name for name in chunked if name not in ranges]
+        if dropped:
+            print(
+                f"{len(dropped)} PDF(s) lost chunks to embedding failures: {', '.join(dropped)}. "
+                "Run `papers-qa index --incremental` to retry them."
+            )
+        with profiling.span("build.index_finish"):
+            index = builder.finish()
+        if client.cache is not None:
+            stats = client.cache.stats()
+            print(f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses.")
+        return index
+
+    @staticmethod
+    def _record_file(manifest: Manifest, path: str, id_range: List[int], complete: bool = True) -> None:
+        st = os.stat(path)
+        manifest.files[os.path.basename(path)] = FileEntry(
+            sha256=file_sha256(path),
+            size=st.st_size,
+            mtime=st.st_mtime,
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
+            encoding=DEFAULT_ENCODING,
+            embed_model=EMBED_MODEL,
+            start_id=id_range[0],
+            end_id=id_range[1],
+            complete=complete,
+        )
+
+    def version(self) -> str:
+        """Identifies the index contents; changes whenever the index file is rewritten."""
+        path = self.index_path
+        if not os.path.exists(path):
+            ref = resources.files("papers_qa").joinpath("pdf_index.faiss")
+            path = str(ref) if isinstance(ref, Path) else "packaged"
+        if not os.path.exists(path):
+            return path
+        st = os.stat(path)
+        return f"{os.path.abspath(path)}:{st.st_mtime_ns}:{st.st_size}"
+
+    @property
+    def ntotal(self) -> int:
+        return int(self.load_index().ntotal)
 
     def load_index(self) -> faiss.Index:
         if self._index is not None:
             return self._index
+        with profiling.span("load.index"):
+            return self._load_index()
+
+    def _load_index(self) -> faiss.Index:
         if os.path.exists(self.index_path):
-            self._index = faiss.read_index(self.index_path)
+            self._index = read_index_mmap(self.index_path)
+            configure_search(self._index)
+            enable_reconstruct(self._index)
             return self._index
 
-        # Fallback: try packaged resource papers_qa/pdf_index.faiss
-        try:
-            with resources.files("papers_qa").joinpath("pdf_index.faiss").open("rb") as f:
-                # faiss can read from file path only; write to a temp file
-                import tempfile
-                with tempfile.NamedTemporaryFile(suffix=".faiss", delete=False) as tmp:
-                    tmp.write(f.read())
-                    tmp.flush()
-                    self._index = faiss.read_index(tmp.name)
-                return self._index
-        except FileNotFoundError:
-            pass
+        # Fallback: packaged resource papers_qa/pdf_index.faiss, mapped in place when it is a real file
+        ref = resources.files("papers_qa").joinpath("pdf_index.faiss")
+        if ref.is_file():
+            if isinstance(ref, Path):
+                self._index = read_index_mmap(str(ref))
+            else:
+                self._index = faiss.deserialize_index(np.frombuffer(ref.read_bytes(), dtype="uint8"))
+            configure_search(self._index)
+            enable_reconstruct(self._index)
+            return self._index
         raise FileNotFoundError(f"FAISS index not found: {self.index_path}")
-        return self._index
 
-    def load_metadata(self) -> List[Tuple[str, str, str]]:
+    def load_metadata(self) -> Sequence[Tuple[str, str, str]]:
         if self._metadata is not None:
             return self._metadata
+        with profiling.span("load.metadata"):
+            return self._load_metadata()
+
+    def _load_metadata(self) -> Sequence[Tuple[str, str, str]]:
         if os.path.exists(self.metadata_path):
-            items: List[Tuple[str, str, str]] = []
-            with open(self.metadata_path, "r", encoding="utf-8") as f:
-                for line in f:
-                    obj = json.loads(line)
-                    items.append((obj["file"], obj["section"], obj["chunk"]))
-            self._metadata = items
-            return items
-
-        # Fallback: try packaged resource papers_qa/metadata.jsonl
-        try:
-            with resources.files("papers_qa").joinpath("metadata.jsonl").open("r", encoding="utf-8") as f:
-                items: List[Tuple[str, str, str]] = []
-                for line in f:
-                    obj = json.loads(line)
-                    items.append((obj["file"], obj["section"], obj["chunk"]))
-                self._metadata = items
-                return items
-        except FileNotFoundError:
-            pass
+            if is_binary(self.metadata_path):
+                self._metadata = MetadataStore.open(self.metadata_path)
+            else:
+                self._metadata = load_jsonl(self.metadata_path)
+            return self._metadata
+
+        # Fallback: try packaged resource papers_qa/metadata.bin
+        ref = resources.files("papers_qa").joinpath("metadata.bin")
+        if ref.is_file():
+            if isinstance(ref, Path):
+                self._metadata = MetadataStore.open(str(ref))
+            else:
+                self._metadata = MetadataStore(ref.read_bytes())
+            return self._metadata
         raise FileNotFoundError(f"Metadata file not found: {self.metadata_path}")
 
+    def locations(self, ids: Sequence[int]) -> np.ndarray:
+        """`(n, 3)` array of `(page, start, end)` for `ids`; 0 marks an unknown location (legacy metadata)."""
+        metadata = self.load_metadata()
+        if isinstance(metadata, MetadataStore):
+            return np.asarray([metadata.location(int(i)) for i in ids], dtype=np.int64).reshape(-1, 3)
+        if self._locations is None:
+            # JSONL rows are kept as (file, section, chunk); read the locations once on first use
+            self._locations = load_locations(self.metadata_path)
+        return self._locations[np.asarray(ids, dtype=np.int64)].reshape(-1, 3)
+
+    def load_bm25(self) -> Optional[BM25Index]:
+        """BM25 index built beside the FAISS index, or None for indexes built without one."""
+        if self._bm25_loaded:
+            return self._bm25
+        self._bm25_loaded = True
+        with profiling.span("load.bm25"):
+            return self._load_bm25()
+
+    def _load_bm25(self) -> Optional[BM25Index]:
+        if os.path.exists(self.index_path):
+            if os.path.exists(self.bm25_path):
+                self._bm25 = BM25Index.load(self.bm25_path)
+            return self._bm25
+
+        # Fallback: packaged resource papers_qa/pdf_index.bm25.npz
+        ref = resources.files("papers_qa").joinpath("pdf_index.bm25.npz")
+        if ref.is_file():
+            with ref.open("rb") as f:
+                self._bm25 = BM25Index.load(f)
+        return self._bm25
+
     def retrieve(self, query_vec: np.ndarray, top_k: int = TOP_K) -> Tuple[np.ndarray, np.ndarray]:
-        index = self.load_index()
-        if query_vec.ndim == 1:
-            query_vec = query_vec[None, :]
-        dists, idxs = index.search(query_vec, top_k)
+        dists, idxs = self.retrieve_many(query_vec, top_k)
         return dists[0], idxs[0]
+
+    def exact_vectors(self) -> Optional[np.ndarray]:
+        """The memory-mapped float32 side file as an `(ntotal, d)` array, or None if the index has none."""
+        if not self._exact_loaded:
+            index = self.load_index()
+            self._exact = open_vectors(self.vectors_path, index.d, int(index.ntotal))
+            self._exact_loaded = True
+        return self._exact
+
+    def vectors(self, ids: Sequence[int]) -> Optional[np.ndarray]:
+        """Stored vectors for `ids` as an `(n, d)` float32 array, or None if the index can't reconstruct them.
+
+        Rows come from the exact float32 side file when the index has one;
+        otherwise quantised indexes (PQ, sq8, fp16) return their approximation.
+        """
+        exact = self.exact_vectors()
+        if exact is not None:
+            with profiling.span("search.exact_vectors"):
+                return np.asarray(exact[np.asarray(ids, dtype="int64")], dtype="float32")
+        try:
+            return self.load_index().reconstruct_batch(np.asarray(ids, dtype="int64"))
+        except RuntimeError:
+            return None
+
+    def filter_mask(self, where: Optional[MetadataFilter]) -> Optional[np.ndarray]:
+        """Boolean mask over vector IDs allowed by `where`, or None when it filters nothing.
+
+        Row IDs per file and per section are grouped once from the metadata,
+        so a mask costs one pass over the matching names; recent masks are
+        kept for repeated filters.
+        """
+        if not where:
+            return None
+        mask = self._masks.get(where)
+        if mask is None:
+            with profiling.span("filter.mask"):
+                mask = np.ones(self.ntotal, dtype=bool)
+                for column, patterns in (("file", where.files), ("section", where.sections)):
+                    if patterns:
+                        mask &= self._rows_matching(column, patterns)
+            if len(self._masks) >= 64:
+                self._masks.clear()
+            self._masks[where] = mask
+        return mask
+
+    def _rows_matching(self, column: str, patterns: Sequence[str]) -> np.ndarray:
+        groups = self._row_groups.get(column)
+        if groups is None:
+            groups = self._row_groups[column] = row_groups(self.load_metadata(), column)
+        out = np.zeros(self.ntotal, dtype=bool)
+        for name, rows in groups.items():
+            if _matches(name, patterns):
+                out[rows] = True
+        return out
+
+    def retrieve_many(
+        self, query_vecs: np.ndarray, top_k: int = TOP_K, mask: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Search a stacked `(n, d)` query matrix in one call; returns `(n, top_k)` arrays.
+
+        With a boolean `mask` over vector IDs (see `filter_mask`), faiss
+        skips disallowed vectors during the search itself, so up to `top_k`
+        allowed hits come back rather than whatever survives a post-filter.
+        """
+        index = self.load_index()
+        if query_vecs.ndim == 1:
+            query_vecs = query_vecs[None, :]
+        if uses_inner_product(index):
+            query_vecs = normalized(query_vecs)
+        if mask is None:
+            return index.search(query_vecs, top_k)
+        if not mask.any():
+            n = query_vecs.shape[0]
+            return np.zeros((n, top_k), dtype="float32"), np.full((n, top_k), -1, dtype="int64")
+        bits = np.packbits(mask, bitorder="little")
+        selector = faiss.IDSelectorBitmap(mask.shape[0], faiss.swig_ptr(bits))
+        return index.search(query_vecs, top_k, params=search_parameters(index, selector))
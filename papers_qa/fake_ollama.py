@@ -0,0 +1,169 @@
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Set
+
+import numpy as np
+
+from .config import EMBED_MODEL, OLLAMA_MODEL
+
+CANNED_TOKENS = ("The ", "answer ", "is ", "in ", "the ", "retrieved ", "context.")
+
+
+def hash_vector(text: str, dim: int) -> np.ndarray:
+    """Deterministic unit vector for `text`, like a real embedding model but free."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vec = np.random.default_rng(seed).standard_normal(dim).astype("float32")
+    return vec / np.linalg.norm(vec)
+
+
+class FakeOllama:
+    """Local stand-in for the Ollama HTTP API, for benchmarks and offline runs.
+
+    Serves `/api/tags`, `/api/pull`, `/api/embed` (hash-based unit vectors)
+    and `/api/generate` (canned tokens, streamed or not). Optional delays
+    emulate model latency; `counts` records requests per endpoint.
+
+    Embed and generate requests for a model not in `models` answer 404
+    like Ollama does until the model is pulled.
+
+    For failure tests, the next `fail_embeds` embed requests answer 500,
+    as does any embed request containing a text in `poison`, and
+    `embed_jitter_s` adds a random delay of up to that much per request so
+    concurrent batches finish out of order.
+    """
+
+    def __init__(
+        self,
+        dim: int = 768,
+        models: Sequence[str] = (EMBED_MODEL, OLLAMA_MODEL),
+        tokens: Sequence[str] = CANNED_TOKENS,
+        embed_delay_s: float = 0.0,
+        token_delay_s: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.dim = dim
+        self.models = list(models)
+        self.tokens = list(tokens)
+        self.embed_delay_s = embed_delay_s
+        self.token_delay_s = token_delay_s
+        self.counts: Dict[str, int] = {}
+        self.fail_embeds = 0
+        self.poison: Set[str] = set()
+        self.embed_jitter_s = 0.0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllama":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeOllama":
+        return self.start()
+
+    def __exit__(self, *exc: object) -> None:
+        self.stop()
+
+    def _should_fail(self, texts: Sequence[str]) -> bool:
+        with self._lock:
+            if self.fail_embeds > 0:
+                self.fail_embeds -= 1
+                return True
+        return any(t in self.poison for t in texts)
+
+    def _count(self, endpoint: str, n: int = 1) -> None:
+        with self._lock:
+            self.counts[endpoint] = self.counts.get(endpoint, 0) + n
+
+    def _handler(self) -> type:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args: object) -> None:
+                pass
+
+            def _send_json(self, obj: object, status: int = 200) -> None:
+                body = json.dumps(obj).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_stream(self, objs: List[dict], delay_s: float = 0.0) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for obj in objs:
+                    if delay_s:
+                        time.sleep(delay_s)
+                    line = (json.dumps(obj) + "\n").encode("utf-8")
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+            def do_GET(self) -> None:
+                if self.path == "/api/tags":
+                    fake._count("tags")
+                    self._send_json({"models": [{"name": m} for m in fake.models]})
+                else:
+                    self._send_json({"error": "not found"}, 404)
+
+            def _model_missing(self, model: str) -> bool:
+                if model in fake.models or f"{model}:latest" in fake.models:
+                    return False
+                self._send_json({"error": f'model "{model}" not found, try pulling it first'}, 404)
+                return True
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if self.path in ("/api/embed", "/api/generate") and self._model_missing(body.get("model", "")):
+                    fake._count("missing_model")
+                elif self.path == "/api/embed":
+                    texts = body.get("input", [])
+                    texts = [texts] if isinstance(texts, str) else texts
+                    fake._count("embed")
+                    fake._count("embed_inputs", len(texts))
+                    if fake.embed_delay_s or fake.embed_jitter_s:
+                        time.sleep(fake.embed_delay_s + random.uniform(0.0, fake.embed_jitter_s))
+                    if fake._should_fail(texts):
+                        self._send_json({"error": "injected failure"}, 500)
+                        return
+                    vecs = [hash_vector(t, fake.dim).tolist() for t in texts]
+                    self._send_json({"model": body.get("model"), "embeddings": vecs})
+                elif self.path == "/api/generate":
+                    fake._count("generate")
+                    if body.get("stream", True):
+                        objs = [{"response": t, "done": False} for t in fake.tokens]
+                        self._send_stream(objs + [{"response": "", "done": True}], fake.token_delay_s)
+                    else:
+                        self._send_json({"response": "".join(fake.tokens), "done": True})
+                elif self.path == "/api/pull":
+                    fake._count("pull")
+                    if body.get("model") not in fake.models:
+                        fake.models.append(body.get("model"))
+                    self._send_stream([{"status": "success"}])
+                else:
+                    self._send_json({"error": "not found"}, 404)
+
+        return Handler
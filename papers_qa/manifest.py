@@ -0,0 +1,79 @@
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Optional
+
+MANIFEST_VERSION = 1
+
+
+@dataclass(slots=True)
+class FileEntry:
+    """What was indexed for one PDF and which vector IDs hold its chunks.
+
+    `complete` is False when some of its chunks failed to embed; updates
+    then treat the PDF as changed and embed it again.
+    """
+    sha256: str
+    size: int
+    mtime: float
+    chunk_size: int
+    chunk_overlap: int
+    encoding: str
+    embed_model: str
+    start_id: int
+    end_id: int
+    complete: bool = True
+
+    @property
+    def params(self) -> tuple:
+        return (self.chunk_size, self.chunk_overlap, self.encoding, self.embed_model)
+
+
+@dataclass(slots=True)
+class Manifest:
+    files: Dict[str, FileEntry] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["Manifest"]:
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    @classmethod
+    def from_dict(cls, data: dict) -> Optional["Manifest"]:
+        if data.get("version") != MANIFEST_VERSION:
+            return None
+        return cls({name: FileEntry(**entry) for name, entry in data.get("files", {}).items()})
+
+    def to_dict(self) -> dict:
+        return {"version": MANIFEST_VERSION, "files": {n: asdict(e) for n, e in self.files.items()}}
+
+    def save(self, path: str) -> None:
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=1)
+        os.replace(tmp, path)
+
+
+def manifest_path_for(index_path: str) -> str:
+    return f"{index_path}.manifest.json"
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def is_unchanged(entry: FileEntry, path: str, params: tuple) -> bool:
+    """True when `path` still matches `entry`; only re-hashes if size or mtime moved."""
+    if entry.params != params:
+        return False
+    st = os.stat(path)
+    if st.st_size == entry.size and st.st_mtime == entry.mtime:
+        return True
+    return st.st_size == entry.size and file_sha256(path) == entry.sha256
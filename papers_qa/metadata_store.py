@@ -0,0 +1,300 @@
+import json
+import mmap
+import os
+import struct
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# Binary layout: header | utf-8 text blob | names table (JSON) | records table
+MAGIC = b"PQAMETA\x00"
+VERSION = 1
+_HEADER = struct.Struct("<8sIQQQQQQ")  # magic, version, n, blob_off, blob_len, names_off, names_len, records_off
+RECORD_DTYPE = np.dtype([
+    ("offset", "<u8"),
+    ("length", "<u4"),
+    ("file", "<u4"),
+    ("section", "<u4"),
+    ("page", "<u4"),
+    ("start", "<u8"),
+    ("end", "<u8"),
+])
+
+Record = Dict[str, Union[str, int]]
+# What a writer needs to reopen its file and continue after the last checkpoint
+WriterState = Dict[str, object]
+
+
+def is_binary(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class MetadataStore:
+    """Read-only chunk metadata backed by a memory-mapped binary file.
+
+    Row i describes FAISS vector i. Indexing returns `(file, section, chunk)`
+    and only decodes that row's text; file and section names are interned.
+    """
+
+    def __init__(self, buf: Union[mmap.mmap, bytes], owner: Optional[object] = None) -> None:
+        magic, version, n, blob_off, blob_len, names_off, names_len, records_off = _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a papers-qa binary metadata file")
+        self._buf = buf
+        self._owner = owner
+        self._blob = memoryview(buf)[blob_off:blob_off + blob_len]
+        names = json.loads(bytes(buf[names_off:names_off + names_len]).decode("utf-8"))
+        self.files: List[str] = names["files"]
+        self.sections: List[str] = names["sections"]
+        self._records = np.frombuffer(buf, dtype=RECORD_DTYPE, count=n, offset=records_off)
+
+    @classmethod
+    def open(cls, path: str) -> "MetadataStore":
+        f = open(path, "rb")
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            f.close()
+        return cls(mm, owner=mm)
+
+    def __len__(self) -> int:
+        return int(self._records.shape[0])
+
+    def __getitem__(self, i: int) -> Tuple[str, str, str]:
+        r = self._records[i]
+        return self.files[r["file"]], self.sections[r["section"]], self.text(i)
+
+    def __iter__(self) -> Iterator[Tuple[str, str, str]]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def text(self, i: int) -> str:
+        r = self._records[i]
+        off = int(r["offset"])
+        return bytes(self._blob[off:off + int(r["length"])]).decode("utf-8")
+
+    def location(self, i: int) -> Tuple[int, int, int]:
+        """`(page, start, end)` of row i; all 0 for rows written before locations were recorded."""
+        r = self._records[i]
+        return int(r["page"]), int(r["start"]), int(r["end"])
+
+    def file_id(self, i: int) -> int:
+        return int(self._records[i]["file"])
+
+    def section_id(self, i: int) -> int:
+        return int(self._records[i]["section"])
+
+    def record(self, i: int) -> Record:
+        r = self._records[i]
+        return {
+            "file": self.files[r["file"]],
+            "section": self.sections[r["section"]],
+            "chunk": self.text(i),
+            "page": int(r["page"]),
+            "start": int(r["start"]),
+            "end": int(r["end"]),
+        }
+
+    def records(self) -> Iterator[Record]:
+        for i in range(len(self)):
+            yield self.record(i)
+
+
+class BinaryMetadataWriter:
+    """Stream records into the binary format; the text blob is written as it arrives.
+
+    Row descriptors are kept in a growable structured array (40 bytes per
+    row) until `close` writes the tables. Passing a `checkpoint()` result as
+    `state` reopens a partly written file and continues from that point.
+    """
+
+    def __init__(self, path: str, state: Optional[WriterState] = None) -> None:
+        self.path = path
+        self._rows = np.empty(1024, dtype=RECORD_DTYPE)
+        self._n = 0
+        self._blob_len = 0
+        self._file_ids: Dict[str, int] = {}
+        self._section_ids: Dict[str, int] = {}
+        if state is None:
+            self._f = open(path, "wb")
+            self._f.write(b"\0" * _HEADER.size)
+            return
+        self._blob_len = int(state["blob_len"])  # type: ignore[arg-type]
+        self._file_ids.update((name, i) for i, name in enumerate(state["files"]))  # type: ignore[arg-type]
+        self._section_ids.update((name, i) for i, name in enumerate(state["sections"]))  # type: ignore[arg-type]
+        rows = np.asarray(state["rows"], dtype=RECORD_DTYPE)
+        self._reserve(rows.shape[0])
+        self._rows[:rows.shape[0]] = rows
+        self._n = rows.shape[0]
+        self._f = open(path, "r+b")
+        # Drop text appended after the checkpoint
+        self._f.truncate(_HEADER.size + self._blob_len)
+        self._f.seek(0, os.SEEK_END)
+
+    def __len__(self) -> int:
+        return self._n
+
+    def _reserve(self, n: int) -> None:
+        if n > self._rows.shape[0]:
+            grown = np.empty(max(n, 2 * self._rows.shape[0]), dtype=RECORD_DTYPE)
+            grown[:self._n] = self._rows[:self._n]
+            self._rows = grown
+
+    def append(self, record: Record) -> None:
+        data = str(record["chunk"]).encode("utf-8")
+        self._f.write(data)
+        file_id = self._file_ids.setdefault(str(record["file"]), len(self._file_ids))
+        section_id = self._section_ids.setdefault(str(record["section"]), len(self._section_ids))
+        self._reserve(self._n + 1)
+        self._rows[self._n] = (
+            self._blob_len,
+            len(data),
+            file_id,
+            section_id,
+            int(record.get("page", 0)),
+            int(record.get("start", 0)),
+            int(record.get("end", 0)),
+        )
+        self._n += 1
+        self._blob_len += len(data)
+
+    def checkpoint(self) -> WriterState:
+        """Flush the text to disk and return the state needed to resume after this row."""
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        return {
+            "blob_len": self._blob_len,
+            "files": list(self._file_ids),
+            "sections": list(self._section_ids),
+            "rows": self._rows[:self._n].copy(),
+        }
+
+    def close(self) -> None:
+        if self._f.closed:
+            return
+        names = json.dumps({"files": list(self._file_ids), "sections": list(self._section_ids)}).encode("utf-8")
+        names_off = _HEADER.size + self._blob_len
+        records_off = names_off + len(names)
+        self._f.write(names)
+        self._f.write(self._rows[:self._n].tobytes())
+        self._f.seek(0)
+        self._f.write(_HEADER.pack(
+            MAGIC, VERSION, self._n, _HEADER.size, self._blob_len, names_off, len(names), records_off
+        ))
+        self._f.close()
+
+    def __enter__(self) -> "BinaryMetadataWriter":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+class JsonlMetadataWriter:
+    """Legacy metadata.jsonl output, one JSON object per line."""
+
+    def __init__(self, path: str, state: Optional[WriterState] = None) -> None:
+        self.path = path
+        self._n = 0
+        if state is None:
+            self._f = open(path, "w", encoding="utf-8")
+            return
+        os.truncate(path, int(state["offset"]))  # type: ignore[arg-type]
+        self._n = int(state["rows"])  # type: ignore[arg-type]
+        self._f = open(path, "a", encoding="utf-8")
+
+    def __len__(self) -> int:
+        return self._n
+
+    def append(self, record: Record) -> None:
+        self._f.write(json.dumps(record) + "\n")
+        self._n += 1
+
+    def checkpoint(self) -> WriterState:
+        """Flush to disk and return the state needed to resume after this line."""
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        return {"offset": self._f.tell(), "rows": self._n}
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self) -> "JsonlMetadataWriter":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+MetadataWriter = Union[BinaryMetadataWriter, JsonlMetadataWriter]
+
+
+def open_writer(path: str, jsonl: Optional[bool] = None, state: Optional[WriterState] = None) -> MetadataWriter:
+    """Writer for `path`; JSONL when the name ends in `.jsonl`, binary otherwise.
+
+    With a `state` from an earlier writer's `checkpoint()`, the file is
+    reopened and appends continue from that checkpoint.
+    """
+    if jsonl is None:
+        jsonl = path.endswith(".jsonl")
+    return JsonlMetadataWriter(path, state) if jsonl else BinaryMetadataWriter(path, state)
+
+
+def iter_records(path: str) -> Iterator[Record]:
+    """Yield every record of a metadata file in either format."""
+    if is_binary(path):
+        yield from MetadataStore.open(path).records()
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def row_groups(metadata: Sequence[Tuple[str, str, str]], column: str) -> Dict[str, np.ndarray]:
+    """Row IDs (ascending) per distinct `file` or `section` name."""
+    if isinstance(metadata, MetadataStore):
+        codes = np.asarray(metadata._records[column])
+        names = metadata.files if column == "file" else metadata.sections
+    else:
+        col = 0 if column == "file" else 1
+        lookup: Dict[str, int] = {}
+        codes = np.fromiter((lookup.setdefault(r[col], len(lookup)) for r in metadata), dtype=np.uint32, count=len(metadata))
+        names = list(lookup)
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(names) + 1))
+    return {
+        name: order[bounds[i]:bounds[i + 1]].astype(np.int64)
+        for i, name in enumerate(names) if bounds[i + 1] > bounds[i]
+    }
+
+
+def load_locations(path: str) -> np.ndarray:
+    """`(n, 3)` array of `(page, start, end)` per row of a metadata file; 0 where a row has none."""
+    if is_binary(path):
+        store = MetadataStore.open(path)
+        return np.stack([store._records[c].astype(np.int64) for c in ("page", "start", "end")], axis=1)
+    rows = [(int(r.get("page", 0)), int(r.get("start", 0)), int(r.get("end", 0))) for r in iter_records(path)]
+    return np.asarray(rows, dtype=np.int64).reshape(-1, 3)
+
+
+def load_jsonl(path: str) -> List[Tuple[str, str, str]]:
+    items: List[Tuple[str, str, str]] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            obj = json.loads(line)
+            items.append((obj["file"], obj["section"], obj["chunk"]))
+    return items
+
+
+def convert(src: str, dst: str) -> int:
+    """Convert between JSONL and binary metadata (direction taken from `dst`'s extension)."""
+    tmp = f"{dst}.tmp"
+    n = 0
+    with open_writer(tmp, jsonl=dst.endswith(".jsonl")) as out:
+        for record in iter_records(src):
+            out.append(record)
+            n += 1
+    os.replace(tmp, dst)
+    return n
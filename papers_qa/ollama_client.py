@@ -1,14 +1,104 @@
 from __future__ import annotations
 import json
+import os
 import shutil
 import subprocess
+import threading
 import time
-from dataclasses import dataclass
-from typing import Iterator, Optional
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, Optional, Sequence, Set, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
 
-from .config import OLLAMA_HOST, OLLAMA_MODEL
+from . import profiling
+from .config import MODEL_CHECK_CACHE_PATH, MODEL_CHECK_TTL, OLLAMA_HOST, OLLAMA_MODEL
+
+
+class ModelPresenceCache:
+    """Models known to be present per Ollama host.
+
+    Entries last for the process and, for `ttl_s` seconds, in a small JSON
+    file shared by CLI runs, so back-to-back commands skip `/api/tags`.
+    """
+
+    def __init__(self, path: str = MODEL_CHECK_CACHE_PATH, ttl_s: float = MODEL_CHECK_TTL) -> None:
+        self.path = path
+        self.ttl_s = ttl_s
+        self._session: Set[Tuple[str, str]] = set()
+        self._lock = threading.Lock()
+
+    def _read(self) -> Dict[str, Dict[str, float]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, data: Dict[str, Dict[str, float]]) -> None:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)) or ".", exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def _persistent(self) -> bool:
+        return self.ttl_s > 0 and bool(self.path)
+
+    def is_known(self, host: str, model: str) -> bool:
+        with self._lock:
+            if (host, model) in self._session:
+                return True
+            if not self._persistent():
+                return False
+            checked = self._read().get(host, {}).get(model)
+            if isinstance(checked, (int, float)) and time.time() - checked <= self.ttl_s:
+                self._session.add((host, model))
+                return True
+            return False
+
+    def remember(self, host: str, models: Sequence[str]) -> None:
+        with self._lock:
+            self._session.update((host, m) for m in models)
+            if self._persistent():
+                data = self._read()
+                now = time.time()
+                data.setdefault(host, {}).update({m: now for m in models})
+                self._write(data)
+
+    def forget(self, host: str) -> None:
+        with self._lock:
+            self._session = {(h, m) for h, m in self._session if h != host}
+            if self._persistent():
+                data = self._read()
+                if data.pop(host, None) is not None:
+                    self._write(data)
+
+
+model_presence = ModelPresenceCache()
+
+
+def model_missing(response: requests.Response) -> bool:
+    """Whether Ollama answered 404 because the requested model isn't on the host."""
+    if response.status_code != 404:
+        return False
+    try:
+        error = response.json().get("error", "")
+    except ValueError:
+        return False
+    return "not found" in str(error)
+
+
+def _pooled_session(pool_size: int = 32) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
 
 @dataclass(slots=True)
@@ -16,15 +106,15 @@ class OllamaClient:
     host: str = OLLAMA_HOST
     model: str = OLLAMA_MODEL
     timeout_s: int = 600
+    _session: requests.Session = field(default_factory=_pooled_session, init=False, repr=False)
 
     # TODO: check env are set
 
     def call(self, prompt: str) -> str:
         """Perform a blocking call to Ollama."""
-        url = f"{self.host}/api/generate"
         payload = {"model": self.model, "prompt": prompt, "stream": False}
         try:
-            response = requests.post(url, json=payload, timeout=self.timeout_s)
+            response = self._generate(payload)
             response.raise_for_status()
             return response.json().get("response", "")
         except requests.RequestException as e:
@@ -32,25 +122,78 @@ class OllamaClient:
 
     def stream(self, prompt: str) -> Iterator[str]:
         """Stream response lines from Ollama."""
-        url = f"{self.host}/api/generate"
         payload = {"model": self.model, "prompt": prompt, "stream": True}
+        t0 = time.perf_counter()
+        tokens = 0
         try:
-            with requests.post(url, json=payload, timeout=self.timeout_s, stream=True) as r:
+            with self._generate(payload, stream=True) as r:
                 r.raise_for_status()
                 for line in r.iter_lines(decode_unicode=True):
                     if not line:
                         continue
                     try:
                         obj = json.loads(line)
-                        yield obj.get("response", "")
                     except json.JSONDecodeError:
                         continue
+                    if not tokens:
+                        profiling.observe("ollama.first_token", t0, time.perf_counter() - t0)
+                    tokens += 1
+                    yield obj.get("response", "")
         except requests.RequestException as e:
+            if isinstance(e, requests.ConnectionError):
+                # The daemon may be gone; re-check readiness on the next run
+                model_presence.forget(self.host)
             raise RuntimeError(f"Ollama streaming failed: {e}") from e
+        finally:
+            profiling.observe("ollama.generate", t0, time.perf_counter() - t0)
+            profiling.count("ollama.tokens", tokens)
 
+    def _generate(self, payload: dict, stream: bool = False) -> requests.Response:
+        url = f"{self.host}/api/generate"
+        response = self._session.post(url, json=payload, timeout=self.timeout_s, stream=stream)
+        if model_missing(response):
+            # The presence cache vouched for a model the host no longer has: check again, pull, retry once
+            response.close()
+            model_presence.forget(self.host)
+            self.ensure_models([self.model])
+            response = self._session.post(url, json=payload, timeout=self.timeout_s, stream=stream)
+        return response
+
+    def ensure_models(self, models: Sequence[str]) -> None:
+        """Ensure the daemon is up and `models` are present, in as few round-trips as possible.
+
+        Models recently seen on this host (see `ModelPresenceCache`) are not
+        checked again; otherwise one `/api/tags` call covers liveness and
+        every model, and only missing models are pulled.
+        """
+        with profiling.span("ollama.ensure_models"):
+            wanted = [m for m in dict.fromkeys(models) if not model_presence.is_known(self.host, m)]
+            if not wanted:
+                return
+            names = self._list_models()
+            if names is None:
+                self.ensure_ready()
+                names = self._list_models() or set()
+            for model in wanted:
+                if model not in names and f"{model}:latest" not in names:
+                    self._pull(model)
+            model_presence.remember(self.host, wanted)
+
+    def _list_models(self) -> Optional[Set[str]]:
+        """Names of local models, or None when the daemon is not reachable."""
+        try:
+            r = self._session.get(f"{self.host}/api/tags", timeout=2)
+            r.raise_for_status()
+            return {m.get("name") for m in r.json().get("models", [])}
+        except (requests.RequestException, ValueError):
+            return None
 
     def ensure_ready(self, timeout: int = 60, interval: float = 0.5) -> None:
         """Ensure Ollama daemon is available and print progress timeline."""
+        with profiling.span("ollama.ensure_ready"):
+            self._ensure_ready(timeout, interval)
+
+    def _ensure_ready(self, timeout: int, interval: float) -> None:
         if self._is_up():
             print("[✓] Ollama daemon already running.")
             return
@@ -72,17 +215,23 @@ class OllamaClient:
 
     def ensure_model(self, model: str) -> None:
         """Ensure model is available locally (pull if missing)."""
+        with profiling.span("ollama.ensure_model"):
+            self._ensure_model(model)
+
+    def _ensure_model(self, model: str) -> None:
         try:
-            resp = requests.get(f"{self.host}/api/tags", timeout=10)
+            resp = self._session.get(f"{self.host}/api/tags", timeout=10)
             resp.raise_for_status()
             if any(m.get("name") == model for m in resp.json().get("models", [])):
                 return
         except requests.RequestException:
             print(f"[…] Checking model '{model}' failed, will try pulling...")
+        self._pull(model)
 
+    def _pull(self, model: str) -> None:
         print(f"[→] Pulling model '{model}'...")
         try:
-            with requests.post(
+            with self._session.post(
                 f"{self.host}/api/pull",
                 json={"model": model, "stream": True},
                 timeout=1800,
@@ -108,7 +257,7 @@ class OllamaClient:
 
     def _is_up(self) -> bool:
         try:
-            r = requests.get(f"{self.host}/api/tags", timeout=2)
+            r = self._session.get(f"{self.host}/api/tags", timeout=2)
             return r.status_code == 200
         except requests.RequestException:
             return False
@@ -125,7 +274,7 @@ class OllamaClient:
 
     def _ensure_model_present(self, timeout_s: int = 1800) -> None:
         try:
-            tags = requests.get(f"{self.host}/api/tags", timeout=10)
+            tags = self._session.get(f"{self.host}/api/tags", timeout=10)
             tags.raise_for_status()
             models = tags.json().get("models", [])
             if any(m.get("name") == self.model for m in models):
@@ -133,7 +282,7 @@ class OllamaClient:
         except requests.RequestException:
             pass
         # Fallback: silent pull without progress
-        resp = requests.post(
+        resp = self._session.post(
             f"{self.host}/api/pull",
             json={"model": self.model, "stream": False},
             timeout=timeout_s,
@@ -0,0 +1,168 @@
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import ContextManager, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+_NOOP: ContextManager[None] = nullcontext()
+_LABEL_ESCAPE = re.compile(r'(["\\])')
+
+
+def _label(name: str) -> str:
+    return _LABEL_ESCAPE.sub(r"\\\1", name)
+
+
+class Recorder:
+    """Thread-safe store of timing spans and counters for one CLI run.
+
+    Spans keep every sample as `(start offset, duration)` in seconds, so
+    they can be summarised or exported event by event.
+    """
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.started_wall = time.time()
+        self.spans: Dict[str, List[Tuple[float, float]]] = {}
+        self.counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, start: float, seconds: float) -> None:
+        with self._lock:
+            self.spans.setdefault(name, []).append((start - self.started, seconds))
+
+    def count(self, name: str, n: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, t0, time.perf_counter() - t0)
+
+    def summary(self) -> List[Tuple[str, int, float, float, float]]:
+        """`(span, calls, total s, mean s, max s)` in first-seen order."""
+        with self._lock:
+            items = [(name, [d for _, d in samples]) for name, samples in self.spans.items()]
+        return [(name, len(ds), sum(ds), sum(ds) / len(ds), max(ds)) for name, ds in items]
+
+    def report(self) -> str:
+        lines = [f"{'stage':<24} {'calls':>7} {'total ms':>10} {'mean ms':>9} {'max ms':>9}"]
+        for name, calls, total, mean, peak in self.summary():
+            lines.append(f"{name:<24} {calls:>7} {total * 1000:>10.1f} {mean * 1000:>9.2f} {peak * 1000:>9.2f}")
+        if self.counters:
+            lines.append("")
+            lines.append(f"{'counter':<24} {'value':>7}")
+            for name, value in self.counters.items():
+                lines.append(f"{name:<24} {value:>7g}")
+        return "\n".join(lines)
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format, e.g. for the node_exporter textfile collector."""
+        lines = ["# HELP papers_qa_span_seconds Time spent in a pipeline stage.", "# TYPE papers_qa_span_seconds summary"]
+        summary = self.summary()
+        for name, calls, total, _, _ in summary:
+            lines.append(f'papers_qa_span_seconds_count{{span="{_label(name)}"}} {calls}')
+            lines.append(f'papers_qa_span_seconds_sum{{span="{_label(name)}"}} {total:.9f}')
+        lines += ["# HELP papers_qa_span_max_seconds Slowest call of a pipeline stage.", "# TYPE papers_qa_span_max_seconds gauge"]
+        for name, _, _, _, peak in summary:
+            lines.append(f'papers_qa_span_max_seconds{{span="{_label(name)}"}} {peak:.9f}')
+        lines += ["# HELP papers_qa_events_total Pipeline event counters.", "# TYPE papers_qa_events_total counter"]
+        for name, value in self.counters.items():
+            lines.append(f'papers_qa_events_total{{name="{_label(name)}"}} {value:g}')
+        return "\n".join(lines) + "\n"
+
+    def to_jsonl(self, command: str = "") -> Iterator[str]:
+        """One JSON object per span sample and per counter, tagged with the run's start time."""
+        run = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_wall))
+        with self._lock:
+            spans = [(name, list(samples)) for name, samples in self.spans.items()]
+            counters = dict(self.counters)
+        for name, samples in spans:
+            for start, seconds in samples:
+                yield json.dumps({
+                    "run": run, "command": command, "kind": "span", "name": name,
+                    "start_ms": round(start * 1000, 3), "duration_ms": round(seconds * 1000, 3),
+                })
+        for name, value in counters.items():
+            yield json.dumps({"run": run, "command": command, "kind": "counter", "name": name, "value": value})
+
+    def export(self, path: str, command: str = "") -> None:
+        """Append JSON lines to a `.jsonl` path; write Prometheus text (atomically) otherwise."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)) or ".", exist_ok=True)
+        if path.endswith(".jsonl"):
+            with open(path, "a", encoding="utf-8") as f:
+                for line in self.to_jsonl(command):
+                    f.write(line + "\n")
+            return
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+
+_recorder: Optional[Recorder] = None
+
+
+def enable() -> Recorder:
+    global _recorder
+    _recorder = Recorder()
+    return _recorder
+
+
+def disable() -> None:
+    global _recorder
+    _recorder = None
+
+
+def active() -> Optional[Recorder]:
+    return _recorder
+
+
+def span(name: str) -> ContextManager[None]:
+    """Time a block as stage `name`; a shared no-op when profiling is off."""
+    rec = _recorder
+    return _NOOP if rec is None else rec.span(name)
+
+
+def observe(name: str, start: float, seconds: float) -> None:
+    rec = _recorder
+    if rec is not None:
+        rec.observe(name, start, seconds)
+
+
+def count(name: str, n: float = 1) -> None:
+    rec = _recorder
+    if rec is not None:
+        rec.count(name, n)
+
+
+def timed_iter(name: str, items: Iterable[T]) -> Iterable[T]:
+    """Yield from `items`, recording the total time spent waiting on it as one `name` sample."""
+    if _recorder is None:
+        return items
+    return _timed_iter(name, items)
+
+
+def _timed_iter(name: str, items: Iterable[T]) -> Iterator[T]:
+    it = iter(items)
+    waited = 0.0
+    t_start = time.perf_counter()
+    try:
+        while True:
+            t0 = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                waited += time.perf_counter() - t0
+                return
+            waited += time.perf_counter() - t0
+            yield item
+    finally:
+        observe(name, t_start, waited)
@@ -1,5 +1,11 @@
-from typing import List, Tuple
+import re
+from dataclasses import dataclass
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
 
+from .chunking import DEFAULT_ENCODING, get_encoding
+from .config import CONTEXT_DEDUP_THRESHOLD, CONTEXT_TOKEN_BUDGET
+
+_WORDS = re.compile(r"\w+")
 
 PROMPT_TEMPLATE: str = (
     "You are a helpful research assistant.\n"
@@ -13,18 +19,139 @@ PROMPT_TEMPLATE: str = (
 )
 
 
-def build_prompt(question: str, contexts: List[Tuple[str, str, str]]) -> str:
-    ctx = "\n".join(f"[{f} | {s}] {chunk}" for f, s, chunk in contexts)
+class Passage(NamedTuple):
+    """A packed prompt passage; `ids` are the vector IDs of the chunks merged into it, when known."""
+    file: str
+    section: str
+    text: str
+    ids: Tuple[int, ...] = ()
+
+
+def build_prompt(question: str, passages: Sequence[Passage]) -> str:
+    ctx = "\n".join(f"[{p.file} | {p.section}] {p.text}" for p in passages)
     return PROMPT_TEMPLATE.format(context=ctx, question=question)
 
 
-def print_unique_contexts(contexts: List[Tuple[str, str, str]]) -> None:
+@dataclass(slots=True)
+class PackStats:
+    chunks_in: int
+    passages_out: int
+    tokens_in: int
+    tokens_out: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_in - self.tokens_out
+
+
+def _overlap(a: str, b: str, probe_len: int = 16) -> int:
+    """Length of the prefix of `b` that repeats the tail of `a`, or -1 if none."""
+    probe = b[:probe_len]
+    if not probe:
+        return -1
+    pos = a.rfind(probe)
+    while pos >= 0:
+        tail = a[pos:]
+        if b.startswith(tail):
+            return len(tail)
+        pos = a.rfind(probe, 0, pos)
+    return -1
+
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / float(len(a | b) or 1)
+
+
+def pack_contexts(
+    contexts: Sequence[Tuple[str, str, str]],
+    ids: Optional[Sequence[int]] = None,
+    budget: int = CONTEXT_TOKEN_BUDGET,
+    dedup_threshold: float = CONTEXT_DEDUP_THRESHOLD,
+) -> Tuple[List[Passage], PackStats]:
+    """Shrink retrieved contexts before they go into the prompt.
+
+    `contexts` must be in relevance order. Overlapping or adjacent chunks
+    of the same file (consecutive vector `ids`) are merged, near-duplicates
+    are dropped, and passages are kept in relevance order until `budget`
+    tokens are used, truncating the last one. A `budget` <= 0 disables
+    the cap. Each passage lists the `ids` it was merged from.
+    """
+    enc = get_encoding(DEFAULT_ENCODING)
+    tokens_in = sum(len(enc.encode(c)) for _, _, c in contexts)
+
+    # 1. Merge chains of neighbouring chunks; a passage ranks as its best member
+    by_file: Dict[str, List[Tuple[int, int, str, str]]] = {}
+    for rank, (f, s, c) in enumerate(contexts):
+        by_file.setdefault(f, []).append((rank, ids[rank] if ids is not None else -1, s, c))
+    passages: List[Tuple[int, Passage]] = []
+    for f, members in by_file.items():
+        if ids is not None:
+            members.sort(key=lambda m: m[1])
+        best, last_id, section, text = members[0]
+        merged = [last_id]
+        for rank, vid, s, c in members[1:]:
+            adjacent = ids is not None and vid == last_id + 1
+            ov = _overlap(text, c)
+            if ov >= 0:
+                text += c[ov:]
+            elif adjacent:
+                text += "\n" + c
+            elif ids is not None and vid == last_id:
+                continue
+            else:
+                passages.append((best, Passage(f, section, text, tuple(merged) if ids is not None else ())))
+                best, section, text = rank, s, c
+                last_id = vid
+                merged = [vid]
+                continue
+            best = min(best, rank)
+            last_id = vid
+            merged.append(vid)
+        passages.append((best, Passage(f, section, text, tuple(merged) if ids is not None else ())))
+    passages.sort(key=lambda p: p[0])
+
+    # 2. Drop near-duplicates of a more relevant passage
+    kept: List[Passage] = []
+    seen: List[set] = []
+    for _, passage in passages:
+        words = set(_WORDS.findall(passage.text.lower()))
+        if any(_jaccard(words, other) >= dedup_threshold for other in seen):
+            continue
+        seen.append(words)
+        kept.append(passage)
+
+    # 3. Fill the token budget in relevance order
+    packed: List[Passage] = []
+    used = 0
+    for passage in kept:
+        toks = enc.encode(passage.text)
+        if budget > 0 and used + len(toks) > budget:
+            room = budget - used
+            if room >= 32:
+                packed.append(passage._replace(text=enc.decode(toks[:room])))
+                used += room
+            break
+        packed.append(passage)
+        used += len(toks)
+
+    return packed, PackStats(len(contexts), len(packed), tokens_in, used)
+
+
+def format_source(source: Dict[str, object]) -> str:
+    """`file | section (p. 3, chars 1200-2450)`; the location is left out when unknown."""
+    text = f"{source['file']} | {source['section']}"
+    if source.get("page"):
+        text += f" (p. {source['page']}, chars {source['start']}-{source['end']})"
+    return text
+
+
+def print_sources(sources: Sequence[Dict[str, object]]) -> None:
     print("Context used:")
     seen = set()
-    for file_name, section, _ in contexts:
-        key = (file_name, section)
-        if key not in seen:
-            seen.add(key)
-            print(f"- {file_name} | {section}")
+    for source in sources:
+        line = format_source(source)
+        if line not in seen:
+            seen.add(line)
+            print(f"- {line}")
 
 
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional, Sequence
+
+import numpy as np
+
+from .config import ANSWER_CACHE_PATH, ANSWER_CACHE_TTL, QUERY_CACHE_SIZE
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """Case- and whitespace-insensitive form of a question, without trailing punctuation."""
+    return _SPACES.sub(" ", question).strip().lower().rstrip("?!. ")
+
+
+@dataclass(slots=True)
+class QueryEmbeddingCache:
+    """In-process LRU of query embeddings, so repeated questions skip the embed round-trip."""
+    max_size: int = QUERY_CACHE_SIZE
+    _items: "OrderedDict[str, np.ndarray]" = field(default_factory=OrderedDict, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    @staticmethod
+    def key(question: str) -> str:
+        return _SPACES.sub(" ", question).strip()
+
+    def get(self, question: str) -> Optional[np.ndarray]:
+        k = self.key(question)
+        with self._lock:
+            vec = self._items.get(k)
+            if vec is not None:
+                self._items.move_to_end(k)
+            return vec
+
+    def put(self, question: str, vec: np.ndarray) -> None:
+        if self.max_size <= 0:
+            return
+        k = self.key(question)
+        with self._lock:
+            self._items[k] = vec
+            self._items.move_to_end(k)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+
+def answer_key(
+    question: str,
+    chunk_ids: Sequence[int],
+    model: str,
+    template: str,
+    index_version: str,
+    token_budget: int,
+    dedup_threshold: float,
+) -> str:
+    """Cache key for a final answer.
+
+    It includes the retrieved chunk IDs and the index version, so a rebuilt
+    index never serves answers computed from the old one, and the context
+    packing settings, which decide what of those chunks reaches the prompt.
+    """
+    template_hash = hashlib.sha256(template.encode("utf-8")).hexdigest()
+    payload = json.dumps([
+        normalize_question(question), [int(i) for i in chunk_ids], model, template_hash, index_version,
+        int(token_budget), float(dedup_threshold),
+    ])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass(slots=True)
+class AnswerCache:
+    """On-disk TTL cache of generated answers, shared across CLI invocations."""
+    path: str
+    ttl_s: float = ANSWER_CACHE_TTL
+    _conn: sqlite3.Connection = field(init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, answer TEXT NOT NULL, created REAL NOT NULL)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT answer, created FROM answers WHERE key = ?", (key,)).fetchone()
+        if row is None or time.time() - row[1] > self.ttl_s:
+            return None
+        return row[0]
+
+    def put(self, key: str, answer: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO answers (key, answer, created) VALUES (?, ?, ?)", (key, answer, now))
+            self._conn.execute("DELETE FROM answers WHERE created < ?", (now - self.ttl_s,))
+            self._conn.commit()
+
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """Answer cache from config, or None when disabled (TTL 0 or empty path)."""
+    if ANSWER_CACHE_TTL <= 0 or not ANSWER_CACHE_PATH:
+        return None
+    return AnswerCache(ANSWER_CACHE_PATH, ANSWER_CACHE_TTL)
@@ -0,0 +1,264 @@
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from . import profiling
+from .ann import normalized
+from .bm25 import reciprocal_rank_fusion, rrf_scores
+from .config import (
+    CONTEXT_DEDUP_THRESHOLD, CONTEXT_TOKEN_BUDGET, FUSION_DEPTH, MMR_LAMBDA, RERANK_DEPTH, RETRIEVAL_MODE,
+    RETRIEVAL_MODES, TOP_K,
+)
+from .embeddings import embed_queries
+from .faiss_store import FaissStore, MetadataFilter
+from .ollama_client import OllamaClient
+from .prompt import PROMPT_TEMPLATE, Passage, build_prompt, pack_contexts
+from .query_cache import AnswerCache, QueryEmbeddingCache, answer_key, get_answer_cache
+from .rerank import CrossEncoder, load_cross_encoder, mmr
+from .shards import ShardedStore
+
+Context = Tuple[str, str, str]
+
+
+@dataclass(slots=True)
+class RagPipeline:
+    """Retrieval and generation over a loaded store, shared by `ask` and `serve`.
+
+    Query embeddings are kept in an in-process LRU. Final answers are kept
+    in a TTL cache keyed on the question, the retrieved chunk IDs, the
+    model, the prompt template, the context packing settings and the index
+    version. When a `timings`
+    dict is passed, each stage adds its wall time in milliseconds.
+
+    With `rerank_depth > 1` (or a `cross_encoder`), `top_k * rerank_depth`
+    candidates are fetched and `rerank` keeps the best `top_k`.
+    """
+    store: Union[FaissStore, ShardedStore]
+    ollama: OllamaClient
+    top_k: int = TOP_K
+    mode: str = RETRIEVAL_MODE
+    query_cache: QueryEmbeddingCache = field(default_factory=QueryEmbeddingCache)
+    answers: Optional[AnswerCache] = field(default_factory=get_answer_cache)
+    rerank_depth: int = RERANK_DEPTH
+    mmr_lambda: float = MMR_LAMBDA
+    cross_encoder: Optional[CrossEncoder] = field(default_factory=load_cross_encoder)
+    context_budget: int = CONTEXT_TOKEN_BUDGET
+    dedup_threshold: float = CONTEXT_DEDUP_THRESHOLD
+
+    def warm(self) -> None:
+        self.store.load_index()
+        self.store.load_metadata()
+        self.store.load_bm25()
+
+    def embed(self, question: str) -> np.ndarray:
+        return self.embed_many([question])
+
+    def embed_many(self, questions: Sequence[str]) -> np.ndarray:
+        """Stacked query embeddings; questions missing from the LRU are embedded in batched requests."""
+        keys = [self.query_cache.key(q) for q in questions]
+        vecs: Dict[str, np.ndarray] = {}
+        missing: List[str] = []
+        for key in dict.fromkeys(keys):
+            qvec = self.query_cache.get(key)
+            if qvec is None:
+                missing.append(key)
+            else:
+                vecs[key] = qvec
+        profiling.count("query_cache.hits", len(vecs))
+        if missing:
+            with profiling.span("query.embed"):
+                fresh = embed_queries(missing)
+            for key, row in zip(missing, fresh):
+                qvec = row[None, :]
+                self.query_cache.put(key, qvec)
+                vecs[key] = qvec
+        return np.vstack([vecs[k] for k in keys])
+
+    def search(
+        self,
+        question: str,
+        timings: Optional[Dict[str, float]] = None,
+        mode: Optional[str] = None,
+        where: Optional[MetadataFilter] = None,
+    ) -> List[int]:
+        """IDs of the best chunks for `question` according to `mode` (default: the pipeline's).
+
+        `lexical` answers from BM25 alone without an embedding call; `hybrid`
+        fuses dense and BM25 rankings with reciprocal-rank fusion. Both fall
+        back to `dense` for indexes built without a BM25 index. `where`
+        limits every ranking to chunks of matching files and sections.
+        """
+        return self.search_many([question], timings, mode, where)[0]
+
+    def search_many(
+        self,
+        questions: Sequence[str],
+        timings: Optional[Dict[str, float]] = None,
+        mode: Optional[str] = None,
+        where: Optional[MetadataFilter] = None,
+    ) -> List[List[int]]:
+        """`search` for many questions: one batched embedding pass and one stacked FAISS search."""
+        mode = mode or self.mode
+        mask = self.store.filter_mask(where)
+        bm25 = self.store.load_bm25() if mode in ("hybrid", "lexical") else None
+        reranking = self.rerank_depth > 1 or self.cross_encoder is not None
+        depth = self.top_k * max(self.rerank_depth, 1) if reranking else self.top_k
+        if bm25 is not None:
+            depth = max(depth, self.top_k * FUSION_DEPTH)
+        if not questions:
+            return []
+
+        lexical: List[List[int]] = []
+        t0 = time.perf_counter()
+        if bm25 is not None:
+            with profiling.span("search.lexical"):
+                lexical = [[int(i) for i in bm25.search(q, depth, mask=mask)[1]] for q in questions]
+            if timings is not None:
+                timings["lexical_ms"] = (time.perf_counter() - t0) * 1000.0
+            if mode == "lexical":
+                if self.cross_encoder is None:
+                    return [ids[:self.top_k] for ids in lexical]
+                return [self.rerank(q, None, ids, timings=timings) for q, ids in zip(questions, lexical)]
+
+        t0 = time.perf_counter()
+        qvecs = self.embed_many(questions)
+        t1 = time.perf_counter()
+        with profiling.span("search.dense"):
+            _, idxx = self.store.retrieve_many(qvecs, depth, mask)
+        t2 = time.perf_counter()
+        if timings is not None:
+            timings["embed_ms"] = (t1 - t0) * 1000.0
+            timings["search_ms"] = (t2 - t1) * 1000.0
+        dense = [[int(i) for i in row if i >= 0] for row in idxx]
+        if bm25 is None:
+            candidates = dense
+        else:
+            with profiling.span("search.fusion"):
+                candidates = [reciprocal_rank_fusion([d, lex], depth) for d, lex in zip(dense, lexical)]
+        if not reranking:
+            return [ids[:self.top_k] for ids in candidates]
+        return [
+            self.rerank(q, qvecs[i], ids, lexical[i] if bm25 is not None else None, timings)
+            for i, (q, ids) in enumerate(zip(questions, candidates))
+        ]
+
+    def rerank(
+        self,
+        question: str,
+        qvec: Optional[np.ndarray],
+        candidates: List[int],
+        lexical: Optional[List[int]] = None,
+        timings: Optional[Dict[str, float]] = None,
+    ) -> List[int]:
+        """Best `top_k` of `candidates`, rescored on CPU and diversified with MMR.
+
+        Relevance is the cross-encoder's score when one is configured, else
+        the exact cosine between the query and each stored vector (fused
+        with the `lexical` ranking by RRF in hybrid mode). MMR then trades
+        relevance against similarity to chunks already picked.
+        """
+        t0 = time.perf_counter()
+        with profiling.span("rerank"):
+            vecs = self.store.vectors(candidates) if candidates else None
+            if vecs is not None:
+                vecs = normalized(vecs)
+            if self.cross_encoder is not None:
+                metadata = self.store.load_metadata()
+                passages = [metadata[i][2] for i in candidates]
+                with profiling.span("rerank.cross_encoder"):
+                    relevance = np.asarray(self.cross_encoder(question, passages), dtype="float32")
+            elif vecs is not None and qvec is not None:
+                cosine = vecs @ normalized(qvec.reshape(1, -1))[0]
+                relevance = cosine
+                if lexical is not None:
+                    exact = [candidates[i] for i in np.argsort(-cosine, kind="stable")]
+                    fused = rrf_scores([exact, lexical])
+                    relevance = np.array([fused[c] for c in candidates], dtype="float32")
+            else:
+                return candidates[:self.top_k]
+            picks = mmr(relevance, vecs, self.top_k, self.mmr_lambda)
+        if timings is not None:
+            timings["rerank_ms"] = timings.get("rerank_ms", 0.0) + (time.perf_counter() - t0) * 1000.0
+        return [candidates[i] for i in picks]
+
+    def contexts(self, ids: List[int]) -> List[Context]:
+        metadata = self.store.load_metadata()
+        with profiling.span("metadata.lookup"):
+            return [metadata[i] for i in ids if 0 <= i < len(metadata)]
+
+    def retrieve(self, question: str, timings: Optional[Dict[str, float]] = None) -> List[Context]:
+        return self.contexts(self.search(question, timings))
+
+    def pack(
+        self, contexts: List[Context], ids: Optional[List[int]] = None, timings: Optional[Dict[str, float]] = None
+    ) -> List[Passage]:
+        """The passages of `contexts` that go into the prompt, after merging, deduplication and the token budget."""
+        with profiling.span("prompt.pack"):
+            packed, stats = pack_contexts(contexts, ids, self.context_budget, self.dedup_threshold)
+        if timings is not None:
+            timings["context_tokens"] = float(stats.tokens_out)
+            timings["context_tokens_saved"] = float(stats.tokens_saved)
+        return packed
+
+    def sources(self, passages: Sequence[Passage]) -> List[Dict[str, object]]:
+        """Citations for the passages a prompt was built from.
+
+        `page` (1-based) is where a passage starts; `start`/`end` are its
+        character offsets in the document text. All three are 0 when
+        unknown, as for indexes built before locations were recorded.
+        """
+        out: List[Dict[str, object]] = []
+        for p in passages:
+            page = start = end = 0
+            if p.ids:
+                locs = self.store.locations(p.ids)
+                page, start, end = int(locs[0, 0]), int(locs[0, 1]), int(locs[-1, 2])
+                # A passage truncated by the token budget ends early
+                end = min(end, start + len(p.text))
+            out.append({"file": p.file, "section": p.section, "page": page, "start": start, "end": end})
+        return out
+
+    def generate(
+        self,
+        question: str,
+        contexts: List[Context],
+        timings: Optional[Dict[str, float]] = None,
+        ids: Optional[List[int]] = None,
+        packed: Optional[List[Passage]] = None,
+    ) -> Iterator[str]:
+        """Stream the answer; with the retrieved `ids`, serve and fill the answer cache.
+
+        Pass `packed` when the caller already called `pack`, e.g. to show
+        the sources before the answer.
+        """
+        key = None
+        t0 = time.perf_counter()
+        if self.answers is not None and ids is not None:
+            key = answer_key(
+                question, ids, self.ollama.model, PROMPT_TEMPLATE, self.store.version(),
+                self.context_budget, self.dedup_threshold,
+            )
+            cached = self.answers.get(key)
+            if cached is not None:
+                profiling.count("answer_cache.hits")
+                if timings is not None:
+                    timings["answer_cache_hit"] = 1.0
+                    timings["generate_ms"] = (time.perf_counter() - t0) * 1000.0
+                yield cached
+                return
+
+        if packed is None:
+            packed = self.pack(contexts, ids, timings)
+        prompt = build_prompt(question, packed)
+        pieces: List[str] = []
+        for piece in self.ollama.stream(prompt):
+            if not pieces and timings is not None:
+                timings["first_token_ms"] = (time.perf_counter() - t0) * 1000.0
+            pieces.append(piece)
+            yield piece
+        if timings is not None:
+            timings["generate_ms"] = (time.perf_counter() - t0) * 1000.0
+        if key is not None and pieces:
+            self.answers.put(key, "".join(pieces))
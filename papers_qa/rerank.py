@@ -0,0 +1,56 @@
+import importlib
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+from .config import RERANKER
+
+# Scores (question, passages) -> one relevance score per passage, higher is better
+CrossEncoder = Callable[[str, Sequence[str]], Sequence[float]]
+
+
+def load_cross_encoder(spec: str = RERANKER) -> Optional[CrossEncoder]:
+    """Resolve a `module:function` cross-encoder hook, or None when `spec` is empty."""
+    if not spec:
+        return None
+    module_name, _, attr = spec.partition(":")
+    if not module_name or not attr:
+        raise RuntimeError(f"Reranker must be given as 'module:function', got '{spec}'.")
+    try:
+        fn = getattr(importlib.import_module(module_name), attr)
+    except (ImportError, AttributeError) as e:
+        raise RuntimeError(f"Cannot load reranker '{spec}': {e}") from e
+    if not callable(fn):
+        raise RuntimeError(f"Reranker '{spec}' is not callable.")
+    return fn
+
+
+def _minmax(x: np.ndarray) -> np.ndarray:
+    span = float(x.max() - x.min()) if x.size else 0.0
+    return (x - x.min()) / span if span > 0 else np.ones_like(x)
+
+
+def mmr(relevance: np.ndarray, vectors: Optional[np.ndarray], k: int, lam: float) -> List[int]:
+    """Maximal marginal relevance: positions of `k` items balancing relevance and novelty.
+
+    `relevance` is rescaled to [0, 1] so `lam` weighs it against cosine
+    similarity to already picked items (`vectors` must be unit-norm). With
+    no vectors, or `lam >= 1`, this is a plain top-k by relevance.
+    """
+    rel = _minmax(np.asarray(relevance, dtype="float32"))
+    k = min(k, rel.shape[0])
+    if vectors is None or lam >= 1.0:
+        return [int(i) for i in np.argsort(-rel, kind="stable")[:k]]
+    sims = vectors @ vectors.T
+    picked: List[int] = []
+    # Highest similarity of each candidate to anything picked so far
+    max_sim = np.full(rel.shape[0], -np.inf, dtype="float32")
+    available = np.ones(rel.shape[0], dtype=bool)
+    for _ in range(k):
+        penalty = np.where(np.isfinite(max_sim), max_sim, 0.0)
+        score = np.where(available, lam * rel - (1.0 - lam) * penalty, -np.inf)
+        best = int(np.argmax(score))
+        picked.append(best)
+        available[best] = False
+        max_sim = np.maximum(max_sim, sims[best])
+    return picked
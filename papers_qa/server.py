@@ -0,0 +1,201 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from .config import SERVE_WORKERS
+from .faiss_store import MetadataFilter
+from .rag import RETRIEVAL_MODES, RagPipeline
+
+_MAX_BODY = 1 << 20
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large", 502: "Bad Gateway"}
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, bytes]]:
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    parts = request_line.decode("latin-1").split()
+    if len(parts) < 2:
+        raise ValueError("malformed request line")
+    method, path = parts[0].upper(), parts[1]
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value.strip())
+    if length > _MAX_BODY:
+        raise OverflowError("request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method, path, body
+
+
+def _head(status: int, content_type: str, chunked: bool = False, length: int = 0) -> bytes:
+    lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}", f"Content-Type: {content_type}", "Connection: close"]
+    lines.append("Transfer-Encoding: chunked" if chunked else f"Content-Length: {length}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def _send_json(writer: asyncio.StreamWriter, status: int, obj: object) -> None:
+    body = json.dumps(obj).encode("utf-8")
+    writer.write(_head(status, "application/json", length=len(body)) + body)
+    await writer.drain()
+
+
+async def _send_chunk(writer: asyncio.StreamWriter, obj: object) -> None:
+    line = (json.dumps(obj) + "\n").encode("utf-8")
+    writer.write(b"%x\r\n%s\r\n" % (len(line), line))
+    await writer.drain()
+
+
+def _patterns(field: str, value: object) -> Tuple[str, ...]:
+    # A single pattern may be sent as a bare string
+    if value is None:
+        return ()
+    if isinstance(value, str):
+        return (value,) if value else ()
+    if isinstance(value, list) and all(isinstance(v, str) for v in value):
+        return tuple(value)
+    raise ValueError(f"'{field}' must be a string or a list of strings")
+
+
+class QueryServer:
+    """Minimal asyncio HTTP server answering questions over a warm `RagPipeline`.
+
+    `POST /ask` with `{"question": ..., "mode", "files", "sections": optional}` streams NDJSON: one `contexts`
+    object, one object per generated `token`, then a final object with
+    `done` and per-stage `timings` (ms). `GET /health` reports readiness.
+    Blocking work (embedding, search, Ollama) runs on worker threads so
+    many questions can be in flight at once.
+    """
+
+    def __init__(self, pipeline: RagPipeline) -> None:
+        self.pipeline = pipeline
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            try:
+                req = await _read_request(reader)
+            except OverflowError as e:
+                await _send_json(writer, 413, {"error": str(e)})
+                return
+            except (ValueError, asyncio.IncompleteReadError) as e:
+                await _send_json(writer, 400, {"error": f"bad request: {e}"})
+                return
+            if req is None:
+                return
+            method, path, body = req
+            if path == "/health":
+                await _send_json(writer, 200, {"status": "ok", "vectors": self.pipeline.store.ntotal})
+            elif path != "/ask":
+                await _send_json(writer, 404, {"error": f"unknown path {path}"})
+            elif method != "POST":
+                await _send_json(writer, 405, {"error": "use POST"})
+            else:
+                await self._ask(writer, body)
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def _ask(self, writer: asyncio.StreamWriter, body: bytes) -> None:
+        try:
+            req = json.loads(body or b"{}")
+        except json.JSONDecodeError:
+            req = None
+        question = str(req.get("question", "")).strip() if isinstance(req, dict) else ""
+        if not question:
+            await _send_json(writer, 400, {"error": "JSON body with a non-empty 'question' is required"})
+            return
+        mode = req.get("mode")
+        if mode is not None and mode not in RETRIEVAL_MODES:
+            await _send_json(writer, 400, {"error": f"'mode' must be one of: {', '.join(RETRIEVAL_MODES)}"})
+            return
+        try:
+            where = MetadataFilter(_patterns("files", req.get("files")), _patterns("sections", req.get("sections")))
+        except ValueError as e:
+            await _send_json(writer, 400, {"error": str(e)})
+            return
+
+        loop = asyncio.get_running_loop()
+        timings: Dict[str, float] = {}
+        t0 = time.perf_counter()
+        try:
+            ids = await loop.run_in_executor(None, self.pipeline.search, question, timings, mode, where)
+            contexts = self.pipeline.contexts(ids)
+            packed = await loop.run_in_executor(None, self.pipeline.pack, contexts, ids, timings) if contexts else []
+        except Exception as e:
+            await _send_json(writer, 502, {"error": str(e)})
+            return
+
+        writer.write(_head(200, "application/x-ndjson", chunked=True))
+        await _send_chunk(writer, {"contexts": self.pipeline.sources(packed)})
+        if contexts:
+            await self._stream_tokens(writer, question, ids, contexts, packed, timings)
+        timings["total_ms"] = (time.perf_counter() - t0) * 1000.0
+        await _send_chunk(writer, {"done": True, "timings": timings})
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def _stream_tokens(
+        self,
+        writer: asyncio.StreamWriter,
+        question: str,
+        ids: List[int],
+        contexts: list,
+        packed: list,
+        timings: Dict[str, float],
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        done = object()
+
+        def produce() -> None:
+            try:
+                for piece in self.pipeline.generate(question, contexts, timings, ids=ids, packed=packed):
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, piece)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+
+        producer = loop.run_in_executor(None, produce)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    await _send_chunk(writer, {"error": str(item)})
+                    continue
+                await _send_chunk(writer, {"token": item})
+        finally:
+            # Stop generating if the client went away
+            stop.set()
+            await producer
+
+    async def serve(self, host: str, port: int) -> None:
+        server = await asyncio.start_server(self.handle, host, port)
+        addrs = ", ".join(str(s.getsockname()) for s in server.sockets)
+        print(f"Serving on {addrs}. POST /ask with {{\"question\": ...}}.", flush=True)
+        async with server:
+            await server.serve_forever()
+
+
+def run_server(pipeline: RagPipeline, host: str, port: int, workers: int = SERVE_WORKERS) -> None:
+    async def main() -> None:
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=workers))
+        await QueryServer(pipeline).serve(host, port)
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,269 @@
+import json
+import os
+from bisect import bisect_right
+from collections import abc
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+import numpy as np
+
+from . import profiling
+from .ann import uses_inner_product
+from .bm25 import BM25Index
+from .config import COLLECTIONS_PATH, TOP_K
+from .faiss_store import FaissStore, MetadataFilter
+
+T = TypeVar("T")
+
+
+@dataclass(slots=True)
+class Collection:
+    index_path: str
+    metadata_path: str
+
+
+@dataclass(slots=True)
+class CollectionRegistry:
+    """Named collections, each an independent index/metadata pair, kept in a small JSON file.
+
+    Adding or dropping a collection only edits the registry; no other
+    collection's index is touched.
+    """
+    path: str = COLLECTIONS_PATH
+    collections: Dict[str, Collection] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: str = COLLECTIONS_PATH) -> "CollectionRegistry":
+        if not os.path.exists(path):
+            return cls(path)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(path, {name: Collection(**entry) for name, entry in data.get("collections", {}).items()})
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {"collections": {n: {"index_path": c.index_path, "metadata_path": c.metadata_path}
+                                 for n, c in self.collections.items()}},
+                f,
+                indent=1,
+            )
+        os.replace(tmp, self.path)
+
+    def add(self, name: str, index_path: str, metadata_path: str) -> None:
+        self.collections[name] = Collection(os.path.abspath(index_path), os.path.abspath(metadata_path))
+
+    def drop(self, name: str) -> None:
+        if name not in self.collections:
+            raise KeyError(f"Unknown collection '{name}'.")
+        del self.collections[name]
+
+    def select(self, names: Sequence[str]) -> Dict[str, FaissStore]:
+        """Stores for `names` (all collections for `all`), in registry order."""
+        wanted = set(names)
+        if "all" in wanted:
+            wanted = set(self.collections)
+        unknown = wanted - set(self.collections)
+        if unknown:
+            known = ", ".join(self.collections) or "none registered"
+            raise KeyError(f"Unknown collection(s): {', '.join(sorted(unknown))} (known: {known}).")
+        return {
+            name: FaissStore(index_path=c.index_path, metadata_path=c.metadata_path)
+            for name, c in self.collections.items() if name in wanted
+        }
+
+
+class ShardedMetadata(abc.Sequence):
+    """Concatenated view of each shard's metadata; global row i maps to one shard's local row."""
+
+    def __init__(self, shards: Sequence[Sequence[Tuple[str, str, str]]], offsets: Sequence[int]) -> None:
+        self._shards = shards
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return self._offsets[-1]
+
+    def __getitem__(self, i: int) -> Tuple[str, str, str]:  # type: ignore[override]
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        s = bisect_right(self._offsets, i) - 1
+        return self._shards[s][i - self._offsets[s]]
+
+
+@dataclass(slots=True)
+class ShardedBM25:
+    """BM25 over several shards: each is searched on its own and hits are merged by score."""
+    shards: List[Tuple[int, int, BM25Index]]  # (global ID offset, global ID end, index)
+    pool: ThreadPoolExecutor
+
+    def search(self, query: str, top_k: int, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        def one(shard: Tuple[int, int, BM25Index]) -> Tuple[np.ndarray, np.ndarray]:
+            off, end, bm25 = shard
+            return bm25.search(query, top_k, mask=None if mask is None else mask[off:end])
+
+        parts = list(self.pool.map(one, self.shards))
+        scores = np.concatenate([sc for sc, _ in parts])
+        ids = np.concatenate([ids + off for (off, _, _), (_, ids) in zip(self.shards, parts)])
+        order = np.argsort(-scores, kind="stable")[:top_k]
+        return scores[order], ids[order]
+
+
+@dataclass(slots=True)
+class ShardedStore:
+    """Read-only `FaissStore` look-alike over several collections.
+
+    Vector IDs are global: shard s holds IDs `offsets[s]` up to
+    `offsets[s + 1]`, in the order the shards were given. Searches fan out
+    to every shard on a thread pool (faiss releases the GIL while it
+    searches) and the per-shard top-k lists are merged by score, so all
+    shards must use the same embedding model and distance metric.
+    """
+    shards: Dict[str, FaissStore]
+    _offsets: Optional[List[int]] = field(default=None, init=False)
+    _pool: Optional[ThreadPoolExecutor] = field(default=None, init=False)
+    _metadata: Optional[ShardedMetadata] = field(default=None, init=False)
+    _bm25: Optional[ShardedBM25] = field(default=None, init=False)
+    _bm25_loaded: bool = field(default=False, init=False)
+
+    def __post_init__(self) -> None:
+        if not self.shards:
+            raise ValueError("A sharded store needs at least one collection.")
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=len(self.shards), thread_name_prefix="shard")
+        return self._pool
+
+    def _map(self, fn: Callable[[FaissStore], T]) -> List[T]:
+        return list(self.pool.map(fn, self.shards.values()))
+
+    @property
+    def offsets(self) -> List[int]:
+        if self._offsets is None:
+            self.load_index()
+        return self._offsets  # type: ignore[return-value]
+
+    @property
+    def ntotal(self) -> int:
+        return self.offsets[-1]
+
+    def load_index(self) -> None:
+        """Load every shard's index in parallel and check they can be searched together."""
+        if self._offsets is not None:
+            return
+        indexes = self._map(FaissStore.load_index)
+        kinds = {(ix.d, uses_inner_product(ix)) for ix in indexes}
+        if len(kinds) > 1:
+            raise RuntimeError(
+                f"Collections {', '.join(self.shards)} differ in vector size or metric; "
+                "build them with the same embedding model and a compatible index type."
+            )
+        offsets = [0]
+        for ix in indexes:
+            offsets.append(offsets[-1] + int(ix.ntotal))
+        self._offsets = offsets
+
+    def load_metadata(self) -> ShardedMetadata:
+        if self._metadata is None:
+            self._metadata = ShardedMetadata(self._map(FaissStore.load_metadata), self.offsets)
+        return self._metadata
+
+    def load_bm25(self) -> Optional[ShardedBM25]:
+        """BM25 over every shard, or None if no shard has one.
+
+        Lexical hits from only some collections would pass for complete
+        results, so shards built without a BM25 index get one built from
+        their metadata (and saved) when the others have theirs.
+        """
+        if not self._bm25_loaded:
+            parts = self._map(FaissStore.load_bm25)
+            missing = [name for name, bm25 in zip(self.shards, parts) if bm25 is None]
+            if missing and len(missing) < len(parts):
+                print(f"Building the missing BM25 index of collection(s) {', '.join(missing)}...")
+                for s, (name, store) in enumerate(self.shards.items()):
+                    if parts[s] is None:
+                        try:
+                            parts[s] = store.build_bm25()
+                        except OSError as e:
+                            raise RuntimeError(
+                                f"Collection '{name}' has no BM25 index and it could not be built: {e}. "
+                                "Rebuild it, or search with --mode dense."
+                            ) from e
+            offsets = self.offsets
+            self._bm25 = ShardedBM25(
+                [(offsets[s], offsets[s + 1], bm25) for s, bm25 in enumerate(parts)], self.pool
+            ) if not missing or len(missing) < len(parts) else None
+            self._bm25_loaded = True
+        return self._bm25
+
+    def version(self) -> str:
+        return "|".join(f"{name}={store.version()}" for name, store in self.shards.items())
+
+    def retrieve(self, query_vec: np.ndarray, top_k: int = TOP_K) -> Tuple[np.ndarray, np.ndarray]:
+        dists, idxs = self.retrieve_many(query_vec, top_k)
+        return dists[0], idxs[0]
+
+    def filter_mask(self, where: Optional[MetadataFilter]) -> Optional[np.ndarray]:
+        """Global mask over vector IDs allowed by `where`, built from each shard's own mask."""
+        if not where:
+            return None
+        return np.concatenate(self._map(lambda store: store.filter_mask(where)))
+
+    def retrieve_many(
+        self, query_vecs: np.ndarray, top_k: int = TOP_K, mask: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Search every shard in parallel and keep the best `top_k` per query across all of them."""
+        offsets = self.offsets
+        stores = list(self.shards.values())
+
+        def one(s: int) -> Tuple[np.ndarray, np.ndarray]:
+            part = None if mask is None else mask[offsets[s]:offsets[s + 1]]
+            return stores[s].retrieve_many(query_vecs, top_k, part)
+
+        with profiling.span("search.fanout"):
+            parts = list(self.pool.map(one, range(len(stores))))
+        dists = np.hstack([d for d, _ in parts])
+        ids = np.hstack([np.where(i >= 0, i + off, -1) for off, (_, i) in zip(offsets, parts)])
+        # Inner product: higher is better; L2: lower is better. Missing hits (-1) go last.
+        inner = uses_inner_product(next(iter(self.shards.values())).load_index())
+        key = np.where(ids >= 0, -dists if inner else dists, np.inf)
+        order = np.argsort(key, axis=1, kind="stable")[:, :top_k]
+        return np.take_along_axis(dists, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+    def vectors(self, ids: Sequence[int]) -> Optional[np.ndarray]:
+        """Stored vectors for global `ids`, or None if any shard holding one can't reconstruct them."""
+        offsets = self.offsets
+        gids = np.asarray(ids, dtype="int64")
+        shard_of = np.searchsorted(offsets, gids, side="right") - 1
+        stores = list(self.shards.values())
+        out: Optional[np.ndarray] = None
+        for s in np.unique(shard_of):
+            rows = np.flatnonzero(shard_of == s)
+            vecs = stores[s].vectors(gids[rows] - offsets[s])
+            if vecs is None:
+                return None
+            if out is None:
+                out = np.empty((gids.shape[0], vecs.shape[1]), dtype="float32")
+            out[rows] = vecs
+        return out
+
+    def locations(self, ids: Sequence[int]) -> np.ndarray:
+        """`(page, start, end)` for global `ids`, looked up in the shard holding each one."""
+        offsets = self.offsets
+        gids = np.asarray(ids, dtype="int64")
+        shard_of = np.searchsorted(offsets, gids, side="right") - 1
+        stores = list(self.shards.values())
+        out = np.zeros((gids.shape[0], 3), dtype=np.int64)
+        for s in np.unique(shard_of):
+            rows = np.flatnonzero(shard_of == s)
+            out[rows] = stores[s].locations(gids[rows] - offsets[s])
+        return out
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
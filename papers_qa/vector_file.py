@@ -0,0 +1,52 @@
+import os
+from typing import Optional
+
+import numpy as np
+
+ITEMSIZE = np.dtype("float32").itemsize
+
+
+def vectors_path_for(index_path: str) -> str:
+    return f"{os.path.splitext(index_path)[0]}.f32"
+
+
+class VectorWriter:
+    """Append float32 vectors to a headerless side file; row i is vector ID i.
+
+    Passing `rows` (with `dim`) reopens a partly written file and drops
+    anything after its first `rows` vectors, e.g. to resume a build from a
+    checkpoint.
+    """
+
+    def __init__(self, path: str, rows: Optional[int] = None, dim: int = 0) -> None:
+        self.path = path
+        if rows is None:
+            self._f = open(path, "wb")
+            return
+        self._f = open(path, "r+b")
+        self._f.truncate(rows * dim * ITEMSIZE)
+        self._f.seek(0, os.SEEK_END)
+
+    def append(self, vecs: np.ndarray) -> None:
+        self._f.write(np.ascontiguousarray(vecs, dtype="float32").tobytes())
+
+    def checkpoint(self) -> None:
+        """Make everything appended so far durable."""
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self) -> "VectorWriter":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def open_vectors(path: str, dim: int, rows: int) -> Optional[np.ndarray]:
+    """Memory-map a side file as a read-only `(rows, dim)` array, or None if it is missing or doesn't match."""
+    if not os.path.exists(path) or os.path.getsize(path) != rows * dim * ITEMSIZE or rows == 0:
+        return None
+    return np.memmap(path, dtype="float32", mode="r", shape=(rows, dim))
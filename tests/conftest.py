@@ -0,0 +1,32 @@
+import os
+from typing import Iterator
+
+import pytest
+import tiktoken
+
+# Keep tests off the user's on-disk caches; config reads these at import time
+os.environ["PAPERS_QA_EMBED_CACHE_PATH"] = ""
+os.environ["PAPERS_QA_ANSWER_CACHE_TTL"] = "0"
+os.environ["PAPERS_QA_MODEL_CHECK_TTL"] = "0"
+
+from papers_qa import chunking, prompt  # noqa: E402
+from papers_qa.fake_ollama import FakeOllama  # noqa: E402
+
+
+def _byte_encoding() -> tiktoken.Encoding:
+    # Offline stand-in for the BPE ranks tiktoken would download
+    ranks = {bytes([i]): i for i in range(256)}
+    return tiktoken.Encoding(name="bytes", pat_str=r"[^\n]+|\n", mergeable_ranks=ranks, special_tokens={})
+
+
+@pytest.fixture
+def offline_encoding(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Tokenise in-process without network access (chunking must then run with one worker)."""
+    monkeypatch.setattr(chunking, "get_encoding", lambda name: _byte_encoding())
+    monkeypatch.setattr(prompt, "get_encoding", lambda name: _byte_encoding())
+
+
+@pytest.fixture
+def fake_ollama() -> Iterator[FakeOllama]:
+    with FakeOllama(dim=32) as fake:
+        yield fake
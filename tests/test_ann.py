@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from papers_qa.ann import IndexBuilder, IndexSpec, index_kind, normalized
+
+
+def _clustered(n_per: int = 200, clusters: int = 5, dim: int = 16) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    centres = rng.normal(size=(clusters, dim)) * 10
+    # Sorted by cluster, as chunks of one PDF after another would be
+    return np.vstack([c + rng.normal(size=(n_per, dim)) for c in centres]).astype("float32")
+
+
+def test_training_sample_is_drawn_from_the_whole_stream() -> None:
+    x = _clustered()
+    builder = IndexBuilder(IndexSpec(kind="sq8", train_size=100))
+    for i in range(0, x.shape[0], 64):
+        builder.add(x[i:i + 64])
+
+    # Each cluster holds a fifth of the stream; a prefix sample would only see the first
+    owners = np.argmax(normalized(builder._sample) @ normalized(x[::200]).T, axis=1)
+    assert set(owners) == set(range(5))
+
+    index = builder.finish()
+    assert index.ntotal == x.shape[0]
+    # Vectors spilled while waiting for training are added back in ID order
+    nearest = np.argmax(index.reconstruct_n(0, x.shape[0]) @ normalized(x).T, axis=1)
+    np.testing.assert_array_equal(nearest, np.arange(x.shape[0]))
+
+
+def test_small_builds_train_on_everything_in_memory() -> None:
+    x = _clustered(n_per=20)
+    builder = IndexBuilder(IndexSpec(kind="ivf-flat", train_size=1000))
+    builder.add(x)
+
+    assert builder._spill is None
+    index = builder.finish()
+    assert index.ntotal == x.shape[0]
+    np.testing.assert_allclose(index.reconstruct_n(0, x.shape[0]), normalized(x), atol=1e-6)
+
+
+@pytest.mark.parametrize("kind", ["flat", "flat-ip", "ivf-flat", "ivf-pq", "hnsw", "sq8", "fp16"])
+def test_index_kind_names_the_built_index(kind: str) -> None:
+    builder = IndexBuilder(IndexSpec(kind=kind, pq_m=4))
+    builder.add(_clustered(n_per=200))
+
+    assert index_kind(builder.finish()) == kind
+
+
+def test_index_kind_reports_the_flat_fallback_for_tiny_builds() -> None:
+    builder = IndexBuilder(IndexSpec(kind="sq8"))
+    builder.add(_clustered(n_per=5))
+
+    assert index_kind(builder.finish()) == "flat-ip"
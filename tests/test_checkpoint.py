@@ -0,0 +1,123 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pytest
+import requests
+
+from papers_qa import faiss_store
+from papers_qa.checkpoint import BuildCheckpoint
+from papers_qa.embeddings import EmbedderUnavailable, EmbeddingClient
+from papers_qa.fake_ollama import FakeOllama
+from papers_qa.faiss_store import FaissStore
+from papers_qa.metadata_store import iter_records
+from papers_qa.vector_file import open_vectors
+
+PAPERS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "research_papers")
+PDFS = ["2510.06042v1.pdf", "2510.07423v1.pdf", "2510.08149v1.pdf"]
+
+
+@pytest.fixture
+def corpus(tmp_path) -> str:
+    folder = tmp_path / "pdfs"
+    folder.mkdir()
+    for name in PDFS:
+        shutil.copy(os.path.join(PAPERS, name), folder)
+    return str(folder)
+
+
+def _store(path, fake: FakeOllama) -> FaissStore:
+    client = EmbeddingClient(host=fake.url, batch_size=16, concurrency=1, retries=0)
+    return FaissStore(str(path / "x.faiss"), str(path / "x.bin"), embedder=client)
+
+
+def _output(store: FaissStore) -> tuple:
+    with open(store.manifest_path, "r", encoding="utf-8") as f:
+        files = json.load(f)["files"]
+    ranges = {name: (e["start_id"], e["end_id"]) for name, e in files.items()}
+    index = store.load_index()
+    vectors = np.array(open_vectors(store.vectors_path, index.d, index.ntotal))
+    return list(iter_records(store.metadata_path)), ranges, vectors
+
+
+def test_build_resumes_after_a_crash_and_matches_a_clean_build(
+    tmp_path, corpus: str, fake_ollama: FakeOllama, offline_encoding: None,
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture,
+) -> None:
+    monkeypatch.setattr(faiss_store, "CHECKPOINT_CHUNKS", 1)
+    (tmp_path / "clean").mkdir()
+    clean = _store(tmp_path / "clean", fake_ollama)
+    clean.build(rebuild=True, folder_path=corpus, workers=1, exact_vectors=True)
+    expected = _output(clean)
+    total = fake_ollama.counts["embed_inputs"]
+
+    # Crash the build one batch after its first snapshot, so the partial files run past it
+    (tmp_path / "crash").mkdir()
+    crashing = _store(tmp_path / "crash", fake_ollama)
+    saves = []
+    save = BuildCheckpoint.save
+    monkeypatch.setattr(BuildCheckpoint, "save", lambda self, *a, **kw: (save(self, *a, **kw), saves.append(1)))
+    post = crashing.embedder._session.post
+    after_save = []
+
+    def dying_post(*args, **kwargs):
+        if saves:
+            after_save.append(1)
+            if len(after_save) > 1:
+                raise requests.ConnectionError("daemon killed")
+        return post(*args, **kwargs)
+
+    monkeypatch.setattr(crashing.embedder._session, "post", dying_post)
+    with pytest.raises(EmbedderUnavailable):
+        crashing.build(rebuild=True, folder_path=corpus, workers=1, exact_vectors=True)
+
+    checkpoint = BuildCheckpoint(crashing.index_path, crashing.metadata_path)
+    state = checkpoint.load()
+    assert state is not None and state.exact_vectors
+    assert 0 < len(state.manifest.files) < len(PDFS)
+    assert os.path.exists(checkpoint.partial_metadata_path)
+    assert os.path.getsize(checkpoint.partial_vectors_path) > state.index.ntotal * state.index.d * 4
+    assert not os.path.exists(crashing.index_path)
+
+    capsys.readouterr()
+    fake_ollama.counts.clear()
+    resumed = _store(tmp_path / "crash", fake_ollama)
+    resumed.build(folder_path=corpus, workers=1, exact_vectors=True)
+
+    assert "Resuming build from checkpoint" in capsys.readouterr().out
+    assert fake_ollama.counts["embed_inputs"] < total
+    records, ranges, vectors = _output(resumed)
+    assert records == expected[0]
+    assert ranges == expected[1]
+    np.testing.assert_array_equal(vectors, expected[2])
+    assert not checkpoint.exists()
+    assert not os.path.exists(checkpoint.partial_metadata_path)
+    assert not [n for n in os.listdir(tmp_path / "crash") if ".ckpt" in n]
+
+
+def test_checkpoint_is_discarded_when_a_covered_pdf_changes(
+    tmp_path, corpus: str, fake_ollama: FakeOllama, offline_encoding: None,
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture,
+) -> None:
+    monkeypatch.setattr(faiss_store, "CHECKPOINT_CHUNKS", 1)
+    store = _store(tmp_path, fake_ollama)
+
+    def interrupt(self, *args, **kwargs):
+        save(self, *args, **kwargs)
+        raise KeyboardInterrupt
+
+    save = BuildCheckpoint.save
+    monkeypatch.setattr(BuildCheckpoint, "save", interrupt)
+    with pytest.raises(KeyboardInterrupt):
+        store.build(rebuild=True, folder_path=corpus, workers=1)
+    monkeypatch.setattr(BuildCheckpoint, "save", save)
+
+    covered = next(iter(BuildCheckpoint(store.index_path, store.metadata_path).load().manifest.files))
+    with open(os.path.join(corpus, covered), "ab") as f:
+        f.write(b"\n% edited\n")
+    capsys.readouterr()
+    store.build(folder_path=corpus, workers=1)
+
+    assert "Discarding build checkpoint" in capsys.readouterr().out
+    assert sorted(_output(store)[1]) == sorted(PDFS)
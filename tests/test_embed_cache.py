@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from papers_qa import embed_cache
+from papers_qa.embed_cache import EmbeddingCache
+
+
+def _vecs(n: int) -> np.ndarray:
+    return np.arange(n * 4, dtype="float32").reshape(n, 4)
+
+
+def test_reads_do_not_write(tmp_path) -> None:
+    cache = EmbeddingCache(str(tmp_path / "c.sqlite"))
+    cache.put_many([b"a", b"b"], _vecs(2))
+    before = cache._conn.total_changes
+
+    for _ in range(50):
+        found = cache.get_many([b"a", b"b", b"missing"])
+
+    np.testing.assert_array_equal(found[b"b"], _vecs(2)[1])
+    assert cache._conn.total_changes == before
+    assert cache.stats()["hits"] == 100
+
+
+def test_stale_hits_refresh_lru_before_eviction(tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    clock = [1000.0]
+    monkeypatch.setattr(embed_cache.time, "time", lambda: clock[0])
+    cache = EmbeddingCache(str(tmp_path / "c.sqlite"), max_entries=3)
+    cache.put_many([b"old", b"x", b"y"], _vecs(3))
+
+    clock[0] += 2 * embed_cache.TOUCH_INTERVAL_S
+    cache.get_many([b"old"])
+    # Over the limit: the least recently used entries go, and "old" was just read
+    cache.put_many([b"z"], _vecs(1))
+
+    assert set(cache.get_many([b"old", b"x", b"y", b"z"])) == {b"old", b"z"}
+
+
+def test_flush_writes_pending_refreshes(tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    clock = [1000.0]
+    monkeypatch.setattr(embed_cache.time, "time", lambda: clock[0])
+    path = str(tmp_path / "c.sqlite")
+    cache = EmbeddingCache(path)
+    cache.put_many([b"a"], _vecs(1))
+    clock[0] += 2 * embed_cache.TOUCH_INTERVAL_S
+    cache.get_many([b"a"])
+
+    cache.close()
+    cache.flush()
+
+    reopened = EmbeddingCache(path)
+    assert reopened._conn.execute("SELECT used FROM embeddings").fetchone()[0] == clock[0]
@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+import requests
+
+from papers_qa import embeddings
+from papers_qa.embeddings import EmbedderUnavailable, EmbeddingClient
+from papers_qa.fake_ollama import FakeOllama, hash_vector
+
+
+def expected(texts, dim=32):
+    return np.vstack([hash_vector(t, dim) for t in texts])
+
+
+def test_embed_stream_splits_into_batches(fake_ollama: FakeOllama) -> None:
+    client = EmbeddingClient(host=fake_ollama.url, batch_size=4, concurrency=2)
+    texts = [f"text {i}" for i in range(10)]
+
+    batches = list(client.embed_stream(texts))
+
+    assert [len(items) for items, _ in batches] == [4, 4, 2]
+    assert fake_ollama.counts["embed"] == 3
+    assert fake_ollama.counts["embed_inputs"] == 10
+    np.testing.assert_allclose(np.vstack([v for _, v in batches]), expected(texts), atol=1e-6)
+
+
+def test_embed_stream_keeps_input_order_under_concurrency(fake_ollama: FakeOllama) -> None:
+    fake_ollama.embed_jitter_s = 0.02
+    client = EmbeddingClient(host=fake_ollama.url, batch_size=2, concurrency=4)
+    texts = [f"chunk {i}" for i in range(40)]
+
+    batches = list(client.embed_stream(texts))
+
+    assert [it for items, _ in batches for it in items] == texts
+    np.testing.assert_allclose(np.vstack([v for _, v in batches]), expected(texts), atol=1e-6)
+
+
+def test_embed_batch_retries_5xx_with_backoff(fake_ollama: FakeOllama, monkeypatch: pytest.MonkeyPatch) -> None:
+    sleeps = []
+    monkeypatch.setattr(embeddings.time, "sleep", sleeps.append)
+    fake_ollama.fail_embeds = 2
+    client = EmbeddingClient(host=fake_ollama.url, retries=3, backoff_s=0.1)
+
+    vecs = client.embed_batch(["a", "b"])
+
+    np.testing.assert_allclose(vecs, expected(["a", "b"]), atol=1e-6)
+    assert fake_ollama.counts["embed"] == 3
+    assert sleeps == pytest.approx([0.1, 0.2])
+
+
+def test_embed_batch_gives_up_after_retries(fake_ollama: FakeOllama, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(embeddings.time, "sleep", lambda s: None)
+    fake_ollama.fail_embeds = 10
+    client = EmbeddingClient(host=fake_ollama.url, retries=2)
+
+    with pytest.raises(RuntimeError, match="embedding failed"):
+        client.embed_batch(["a"])
+    assert fake_ollama.counts["embed"] == 3
+
+
+def test_embed_batch_retries_connection_errors(fake_ollama: FakeOllama, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(embeddings.time, "sleep", lambda s: None)
+    client = EmbeddingClient(host=fake_ollama.url, retries=2)
+    post = client._session.post
+    calls = []
+
+    def flaky_post(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 1:
+            raise requests.ConnectionError("connection reset")
+        return post(*args, **kwargs)
+
+    monkeypatch.setattr(client._session, "post", flaky_post)
+
+    vecs = client.embed_batch(["a"])
+
+    assert len(calls) == 2
+    np.testing.assert_allclose(vecs, expected(["a"]), atol=1e-6)
+
+
+def test_embed_stream_skips_a_text_that_keeps_failing(fake_ollama: FakeOllama, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(embeddings.time, "sleep", lambda s: None)
+    fake_ollama.poison = {"bad"}
+    client = EmbeddingClient(host=fake_ollama.url, batch_size=3, retries=1)
+
+    batches = list(client.embed_stream(["a", "bad", "c", "bad"]))
+
+    # The failed batch is retried item by item; a batch of only bad texts yields nothing
+    assert [items for items, _ in batches] == [["a", "c"]]
+    np.testing.assert_allclose(batches[0][1], expected(["a", "c"]), atol=1e-6)
+
+
+def test_embed_stream_stops_when_ollama_is_unreachable(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(embeddings.time, "sleep", lambda s: None)
+    # Nothing listens on the discard port, so every request is refused
+    client = EmbeddingClient(host="http://127.0.0.1:9", batch_size=4, concurrency=1, retries=2)
+    post = client._session.post
+    calls = []
+
+    def counted_post(*args, **kwargs):
+        calls.append(args)
+        return post(*args, **kwargs)
+
+    monkeypatch.setattr(client._session, "post", counted_post)
+
+    with pytest.raises(EmbedderUnavailable):
+        list(client.embed_stream([f"text {i}" for i in range(16)]))
+    # No per-item fallback: at most the two batches in flight, each with its retries
+    assert len(calls) <= 2 * 3
+
+
+def test_a_failed_prepare_runs_once_and_ends_the_stream(fake_ollama: FakeOllama) -> None:
+    calls = []
+
+    def prepare() -> None:
+        calls.append(1)
+        raise RuntimeError("Ollama embeddings not available (daemon failed to start)")
+
+    client = EmbeddingClient(host=fake_ollama.url, batch_size=4, concurrency=2, prepare=prepare)
+
+    with pytest.raises(EmbedderUnavailable, match="Ollama embeddings not available"):
+        list(client.embed_stream([f"text {i}" for i in range(32)]))
+    with pytest.raises(EmbedderUnavailable):
+        client.embed_batch(["again"])
+    assert len(calls) == 1
+    assert fake_ollama.counts.get("embed", 0) == 0
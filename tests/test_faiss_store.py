@@ -0,0 +1,82 @@
+import json
+import os
+import shutil
+
+import pytest
+from PyPDF2 import PdfWriter
+
+from papers_qa.embeddings import EmbeddingClient
+from papers_qa.fake_ollama import FakeOllama
+from papers_qa.faiss_store import FaissStore
+
+PAPERS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "research_papers")
+
+
+def _manifest_ranges(store: FaissStore) -> dict:
+    with open(store.manifest_path, "r", encoding="utf-8") as f:
+        return {name: (e["start_id"], e["end_id"]) for name, e in json.load(f)["files"].items()}
+
+
+@pytest.fixture
+def corpus(tmp_path) -> str:
+    folder = tmp_path / "pdfs"
+    folder.mkdir()
+    shutil.copy(os.path.join(PAPERS, "2510.07423v1.pdf"), folder)
+    writer = PdfWriter()
+    writer.add_blank_page(width=200, height=200)
+    with open(folder / "blank.pdf", "wb") as f:
+        writer.write(f)
+    return str(folder)
+
+
+def test_pdfs_without_chunks_are_recorded_and_skipped_by_updates(
+    tmp_path, corpus: str, fake_ollama: FakeOllama, offline_encoding: None, capsys: pytest.CaptureFixture
+) -> None:
+    store = FaissStore(str(tmp_path / "x.faiss"), str(tmp_path / "x.bin"), embedder=EmbeddingClient(host=fake_ollama.url))
+    store.build(rebuild=True, folder_path=corpus, workers=1)
+
+    ranges = _manifest_ranges(store)
+    n = store.ntotal
+    assert ranges["blank.pdf"] == (n, n)
+    assert ranges["2510.07423v1.pdf"] == (0, n)
+
+    capsys.readouterr()
+    store.build(incremental=True, folder_path=corpus, workers=1)
+    assert "Index is up to date." in capsys.readouterr().out
+
+
+def test_unreadable_pdfs_are_retried(
+    tmp_path, corpus: str, fake_ollama: FakeOllama, offline_encoding: None, capsys: pytest.CaptureFixture
+) -> None:
+    with open(os.path.join(corpus, "corrupt.pdf"), "wb") as f:
+        f.write(b"not a pdf")
+    store = FaissStore(str(tmp_path / "x.faiss"), str(tmp_path / "x.bin"), embedder=EmbeddingClient(host=fake_ollama.url))
+    store.build(rebuild=True, folder_path=corpus, workers=1)
+
+    assert "corrupt.pdf" not in _manifest_ranges(store)
+    capsys.readouterr()
+    store.build(incremental=True, folder_path=corpus, workers=1)
+    assert "1 new or changed PDF(s)" in capsys.readouterr().out
+
+
+def test_pdfs_with_dropped_chunks_are_embedded_again_by_updates(
+    tmp_path, corpus: str, fake_ollama: FakeOllama, offline_encoding: None, capsys: pytest.CaptureFixture
+) -> None:
+    embedder = EmbeddingClient(host=fake_ollama.url, retries=0, concurrency=1)
+    store = FaissStore(str(tmp_path / "x.faiss"), str(tmp_path / "x.bin"), embedder=embedder)
+    # The first batch fails, then so does the first text of its item-by-item retry
+    fake_ollama.fail_embeds = 2
+    store.build(rebuild=True, folder_path=corpus, workers=1)
+
+    assert "1 PDF(s) lost chunks to embedding failures: 2510.07423v1.pdf" in capsys.readouterr().out
+    partial = store.ntotal
+    with open(store.manifest_path, "r", encoding="utf-8") as f:
+        assert json.load(f)["files"]["2510.07423v1.pdf"]["complete"] is False
+
+    store.build(incremental=True, folder_path=corpus, workers=1)
+
+    assert "1 new or changed PDF(s)" in capsys.readouterr().out
+    assert store.ntotal == partial + 1
+    assert _manifest_ranges(store)["2510.07423v1.pdf"] == (0, partial + 1)
+    store.build(incremental=True, folder_path=corpus, workers=1)
+    assert "Index is up to date." in capsys.readouterr().out
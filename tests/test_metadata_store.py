@@ -0,0 +1,88 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from papers_qa.embeddings import EmbeddingClient
+from papers_qa.fake_ollama import FakeOllama
+from papers_qa.faiss_store import FaissStore
+from papers_qa.metadata_store import MetadataStore, convert, is_binary, iter_records, open_writer
+
+PAPERS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "research_papers")
+
+RECORDS = [
+    {"file": "a.pdf", "section": "Abstract", "chunk": "Agents plan.", "page": 1, "start": 0, "end": 12},
+    {"file": "a.pdf", "section": "Méthode", "chunk": "Ünïcode — text ✓", "page": 2, "start": 40, "end": 56},
+    {"file": "b.pdf", "section": "Abstract", "chunk": "", "page": 1, "start": 0, "end": 0},
+    {"file": "b.pdf", "section": "Results", "chunk": "Recall is 0.99.", "page": 7, "start": 900, "end": 915},
+]
+
+
+def _write(path: str, records, **kwargs) -> None:
+    with open_writer(path, **kwargs) as out:
+        for r in records:
+            out.append(r)
+
+
+def test_binary_round_trip(tmp_path) -> None:
+    path = str(tmp_path / "m.bin")
+    _write(path, RECORDS)
+
+    store = MetadataStore.open(path)
+    assert is_binary(path)
+    assert len(store) == len(RECORDS)
+    assert list(store.records()) == RECORDS
+    assert store[1] == ("a.pdf", "Méthode", "Ünïcode — text ✓")
+    assert store.location(3) == (7, 900, 915)
+    # File and section names are stored once
+    assert store.files == ["a.pdf", "b.pdf"]
+    assert store.sections == ["Abstract", "Méthode", "Results"]
+
+
+@pytest.mark.parametrize("name", ["m.bin", "m.jsonl"])
+def test_writer_resumes_from_a_checkpoint(tmp_path, name: str) -> None:
+    path = str(tmp_path / name)
+    out = open_writer(path)
+    for r in RECORDS[:2]:
+        out.append(r)
+    state = out.checkpoint()
+    # Rows appended after the checkpoint are lost in the crash
+    out.append({"file": "lost.pdf", "section": "Lost", "chunk": "never committed"})
+    out._f.flush()
+    out._f.close()
+
+    with open_writer(path, state=state) as resumed:
+        assert len(resumed) == 2
+        for r in RECORDS[2:]:
+            resumed.append(r)
+
+    assert list(iter_records(path)) == RECORDS
+
+
+def test_convert_round_trips_between_formats(tmp_path) -> None:
+    src = str(tmp_path / "m.jsonl")
+    _write(src, RECORDS)
+
+    assert convert(src, str(tmp_path / "m.bin")) == len(RECORDS)
+    assert convert(str(tmp_path / "m.bin"), str(tmp_path / "back.jsonl")) == len(RECORDS)
+
+    assert is_binary(str(tmp_path / "m.bin"))
+    with open(tmp_path / "back.jsonl", "r", encoding="utf-8") as f:
+        assert [json.loads(line) for line in f] == RECORDS
+
+
+def test_built_metadata_converts_to_jsonl_and_back(tmp_path, fake_ollama: FakeOllama, offline_encoding: None) -> None:
+    folder = tmp_path / "pdfs"
+    folder.mkdir()
+    shutil.copy(os.path.join(PAPERS, "2510.07423v1.pdf"), folder)
+    store = FaissStore(str(tmp_path / "x.faiss"), str(tmp_path / "x.bin"), embedder=EmbeddingClient(host=fake_ollama.url))
+    store.build(rebuild=True, folder_path=str(folder), workers=1)
+    built = list(iter_records(store.metadata_path))
+
+    convert(store.metadata_path, str(tmp_path / "x.jsonl"))
+    convert(str(tmp_path / "x.jsonl"), str(tmp_path / "again.bin"))
+
+    assert len(built) == store.ntotal
+    assert list(iter_records(str(tmp_path / "again.bin"))) == built
+    assert any(r["page"] > 0 and r["end"] > r["start"] for r in built)
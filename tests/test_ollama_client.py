@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from papers_qa.config import EMBED_MODEL, OLLAMA_MODEL
+from papers_qa.embeddings import EmbeddingClient
+from papers_qa.fake_ollama import CANNED_TOKENS, FakeOllama, hash_vector
+from papers_qa.ollama_client import OllamaClient, model_presence
+
+
+@pytest.fixture
+def stale_host(fake_ollama: FakeOllama) -> FakeOllama:
+    # Both models are cached as present, but the host has since lost them
+    model_presence.remember(fake_ollama.url, [EMBED_MODEL, OLLAMA_MODEL])
+    fake_ollama.models = []
+    return fake_ollama
+
+
+def test_call_pulls_a_missing_model_and_retries(stale_host: FakeOllama) -> None:
+    answer = OllamaClient(host=stale_host.url).call("hello")
+
+    assert answer == "".join(CANNED_TOKENS)
+    assert stale_host.counts["missing_model"] == 1
+    assert stale_host.counts["pull"] == 1
+    assert stale_host.counts["generate"] == 1
+
+
+def test_stream_pulls_a_missing_model_and_retries(stale_host: FakeOllama) -> None:
+    tokens = list(OllamaClient(host=stale_host.url).stream("hello"))
+
+    assert "".join(tokens) == "".join(CANNED_TOKENS)
+    assert stale_host.counts["pull"] == 1
+    assert model_presence.is_known(stale_host.url, OLLAMA_MODEL)
+
+
+def test_embed_pulls_a_missing_model_and_retries(stale_host: FakeOllama) -> None:
+    vecs = EmbeddingClient(host=stale_host.url, retries=0).embed_batch(["a"])
+
+    np.testing.assert_allclose(vecs, hash_vector("a", stale_host.dim)[None, :], atol=1e-6)
+    assert stale_host.counts["pull"] == 1
+    assert EMBED_MODEL in stale_host.models
@@ -0,0 +1,100 @@
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List
+
+import pytest
+import requests
+
+from papers_qa import embeddings
+from papers_qa.embeddings import EmbeddingClient
+from papers_qa.fake_ollama import CANNED_TOKENS, FakeOllama
+from papers_qa.faiss_store import FaissStore
+from papers_qa.ollama_client import OllamaClient
+from papers_qa.rag import RagPipeline
+from papers_qa.server import QueryServer
+
+
+@pytest.fixture
+def server_url(tmp_path, monkeypatch: pytest.MonkeyPatch, offline_encoding: None) -> Iterator[str]:
+    # The packaged index holds 768-dimensional vectors; missing paths fall back to it
+    with FakeOllama(dim=768) as fake:
+        monkeypatch.setattr(embeddings, "_default_client", EmbeddingClient(host=fake.url))
+        store = FaissStore(str(tmp_path / "missing.faiss"), str(tmp_path / "missing.bin"))
+        pipeline = RagPipeline(store, OllamaClient(host=fake.url), answers=None, cross_encoder=None)
+        pipeline.warm()
+
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        server = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(QueryServer(pipeline).handle, "127.0.0.1", 0), loop
+        ).result()
+        port = server.sockets[0].getsockname()[1]
+        try:
+            yield f"http://127.0.0.1:{port}"
+        finally:
+            loop.call_soon_threadsafe(server.close)
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout=5)
+
+
+def _ask(url: str, question: str) -> List[dict]:
+    with requests.post(f"{url}/ask", json={"question": question}, stream=True, timeout=30) as r:
+        assert r.status_code == 200
+        assert r.headers["Content-Type"] == "application/x-ndjson"
+        return [json.loads(line) for line in r.iter_lines() if line]
+
+
+def test_health_reports_vector_count(server_url: str) -> None:
+    r = requests.get(f"{server_url}/health", timeout=10)
+
+    assert r.status_code == 200
+    assert r.json() == {"status": "ok", "vectors": 540}
+
+
+def test_ask_streams_contexts_tokens_and_timings(server_url: str) -> None:
+    lines = _ask(server_url, "How do UI agents plan their actions?")
+
+    contexts = lines[0]["contexts"]
+    assert contexts and {"file", "section", "page", "start", "end"} <= set(contexts[0])
+    assert "".join(line["token"] for line in lines[1:-1]) == "".join(CANNED_TOKENS)
+    final = lines[-1]
+    assert final["done"] is True
+    assert {"search_ms", "first_token_ms", "generate_ms", "total_ms", "context_tokens"} <= set(final["timings"])
+
+
+@pytest.mark.parametrize("body", [b"{not json", b"[1, 2]", b"{}", b'{"question": "   "}'])
+def test_ask_rejects_bad_bodies(server_url: str, body: bytes) -> None:
+    r = requests.post(f"{server_url}/ask", data=body, timeout=10)
+
+    assert r.status_code == 400
+    assert "question" in r.json()["error"]
+
+
+def test_ask_rejects_unknown_mode(server_url: str) -> None:
+    r = requests.post(f"{server_url}/ask", json={"question": "planning", "mode": "fuzzy"}, timeout=10)
+
+    assert r.status_code == 400
+    assert "mode" in r.json()["error"]
+
+
+@pytest.mark.parametrize("field, value", [("files", 3), ("sections", {"a": 1}), ("files", ["ok*", 2])])
+def test_ask_names_a_malformed_filter(server_url: str, field: str, value: object) -> None:
+    r = requests.post(f"{server_url}/ask", json={"question": "planning", field: value}, timeout=10)
+
+    assert r.status_code == 400
+    assert r.json()["error"] == f"'{field}' must be a string or a list of strings"
+
+
+def test_concurrent_asks_all_finish(server_url: str) -> None:
+    questions = [f"What does paper {i} say about planning?" for i in range(8)]
+
+    with ThreadPoolExecutor(max_workers=len(questions)) as pool:
+        results = list(pool.map(lambda q: _ask(server_url, q), questions))
+
+    for lines in results:
+        assert lines[0]["contexts"]
+        assert lines[-1]["done"] is True
+        assert "".join(line.get("token", "") for line in lines) == "".join(CANNED_TOKENS)
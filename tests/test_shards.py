@@ -0,0 +1,32 @@
+import os
+import shutil
+
+from papers_qa.embeddings import EmbeddingClient
+from papers_qa.fake_ollama import FakeOllama
+from papers_qa.faiss_store import FaissStore
+from papers_qa.shards import ShardedStore
+
+PAPERS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "research_papers")
+
+
+def test_lexical_search_covers_a_collection_built_without_bm25(
+    tmp_path, fake_ollama: FakeOllama, offline_encoding: None
+) -> None:
+    folder = tmp_path / "pdfs"
+    folder.mkdir()
+    shutil.copy(os.path.join(PAPERS, "2510.07423v1.pdf"), folder)
+    a = FaissStore(str(tmp_path / "a.faiss"), str(tmp_path / "a.bin"), embedder=EmbeddingClient(host=fake_ollama.url))
+    a.build(rebuild=True, folder_path=str(folder), workers=1)
+    # A second collection with the same chunks, as if indexed before BM25 existed
+    for ext in (".faiss", ".bin"):
+        shutil.copy(tmp_path / f"a{ext}", tmp_path / f"b{ext}")
+    b = FaissStore(str(tmp_path / "b.faiss"), str(tmp_path / "b.bin"))
+
+    sharded = ShardedStore({"a": a, "b": b})
+    bm25 = sharded.load_bm25()
+
+    assert bm25 is not None and os.path.exists(b.bm25_path)
+    n = a.ntotal
+    assert [(off, end) for off, end, _ in bm25.shards] == [(0, n), (n, 2 * n)]
+    _, ids = bm25.search("agents", 2 * n)
+    assert (ids < n).any() and (ids >= n).any()